@@ -0,0 +1,64 @@
+"""Preenche os textos de busca (dsc_busca, dsc_nome_busca) dos registros anteriores a essas colunas.
+
+Percorre tp_aips e tp_arquivos_originais em lotes pela chave primária,
+normaliza título, RA e nome de arquivo com sanitize_title e grava o lote com
+um único UPDATE em massa. Pode ser repetido com segurança: só as linhas
+ainda nulas são processadas.
+
+Uso:
+    python backfill_busca.py [--lote 1000]
+"""
+import argparse
+
+from sqlalchemy import update
+
+import models
+from main import SessionLocal, atualizar_schema, sanitize_title, texto_busca_aip
+
+TABELAS = [
+    (
+        models.TpAip, models.TpAip.cod_id, "cod_id", models.TpAip.dsc_busca,
+        [models.TpAip.nom_titulo, models.TpAip.nom_ra],
+        lambda titulo, ra: {"dsc_busca": texto_busca_aip(titulo, ra)},
+    ),
+    (
+        models.TpArquivoOriginal, models.TpArquivoOriginal.cod_original, "cod_original", models.TpArquivoOriginal.dsc_nome_busca,
+        [models.TpArquivoOriginal.nom_arquivo],
+        lambda nome: {"dsc_nome_busca": sanitize_title(nome)},
+    ),
+]
+
+
+def preencher_tabela(modelo, coluna_pk, nome_pk, coluna_busca, colunas_origem, normalizar, lote):
+    atualizadas = 0
+    ultimo_id = None
+    while True:
+        with SessionLocal() as db:
+            query = db.query(coluna_pk, *colunas_origem).filter(coluna_busca == None)
+            if ultimo_id is not None:
+                query = query.filter(coluna_pk > ultimo_id)
+            linhas = query.order_by(coluna_pk).limit(lote).all()
+            if not linhas:
+                return atualizadas
+            ultimo_id = linhas[-1][0]
+
+            db.execute(update(modelo), [{nome_pk: linha[0], **normalizar(*linha[1:])} for linha in linhas])
+            db.commit()
+            atualizadas += len(linhas)
+            print(f"    -> {modelo.__tablename__}: {atualizadas} linha(s) preenchida(s).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lote", type=int, default=1000, help="linhas lidas e atualizadas por vez")
+    args = parser.parse_args()
+
+    atualizar_schema()
+    for modelo, coluna_pk, nome_pk, coluna_busca, colunas_origem, normalizar in TABELAS:
+        print(f"--- Backfill de busca em {modelo.__tablename__} ---")
+        total = preencher_tabela(modelo, coluna_pk, nome_pk, coluna_busca, colunas_origem, normalizar, args.lote)
+        print(f"--- {modelo.__tablename__}: {total} linha(s) preenchida(s) ---")
+
+
+if __name__ == "__main__":
+    main()
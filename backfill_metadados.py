@@ -0,0 +1,77 @@
+"""Preenche tamanho e data de modificação dos arquivos registrados antes dessas colunas existirem.
+
+Percorre tp_arquivos_originais e tp_arquivos_preservacao em lotes pela chave
+primária, consulta o storage em paralelo para as linhas sem tamanho e grava
+o lote com um único UPDATE em massa. Linhas cuja consulta falha continuam
+nulas e são tentadas de novo na próxima execução.
+
+Uso:
+    python backfill_metadados.py [--lote 500] [--concorrencia 16]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from sqlalchemy import update
+
+import models
+import storage
+from main import SessionLocal, atualizar_schema
+
+TABELAS = [
+    (models.TpArquivoOriginal, models.TpArquivoOriginal.cod_original, "cod_original", "originais"),
+    (models.TpArquivoPreservacao, models.TpArquivoPreservacao.cod_preservacao, "cod_preservacao", "preservacoes"),
+]
+
+
+def consultar(bucket, cod, path):
+    try:
+        metadados = storage.buscar_metadados(bucket, path)
+        return cod, metadados.get("size"), storage.converter_last_modified(metadados.get("lastModified"))
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"    -> AVISO: Falha ao consultar '{bucket}/{path}': {e}")
+        return cod, None, None
+
+
+def preencher_tabela(modelo, coluna_pk, nome_pk, bucket, lote, executor):
+    atualizadas = 0
+    ultimo_id = 0
+    while True:
+        with SessionLocal() as db:
+            linhas = db.query(coluna_pk, modelo.dsc_caminho_minio).filter(
+                modelo.num_tamanho_bytes == None,
+                coluna_pk > ultimo_id,
+            ).order_by(coluna_pk).limit(lote).all()
+            if not linhas:
+                return atualizadas
+            ultimo_id = linhas[-1][0]
+
+            resultados = executor.map(lambda linha: consultar(bucket, linha[0], linha[1]), linhas)
+            valores = [
+                {nome_pk: cod, "num_tamanho_bytes": tamanho, "dhs_modificacao": modificacao}
+                for cod, tamanho, modificacao in resultados
+                if tamanho is not None
+            ]
+            if valores:
+                db.execute(update(modelo), valores)
+                db.commit()
+            atualizadas += len(valores)
+            print(f"    -> {modelo.__tablename__}: {atualizadas} linha(s) preenchida(s) até o id {ultimo_id}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lote", type=int, default=500, help="linhas lidas e atualizadas por vez")
+    parser.add_argument("--concorrencia", type=int, default=16, help="consultas simultâneas ao storage")
+    args = parser.parse_args()
+
+    atualizar_schema()
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as executor:
+        for modelo, coluna_pk, nome_pk, bucket in TABELAS:
+            print(f"--- Backfill de {modelo.__tablename__} ---")
+            total = preencher_tabela(modelo, coluna_pk, nome_pk, bucket, args.lote, executor)
+            print(f"--- {modelo.__tablename__}: {total} linha(s) preenchida(s) ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""Benchmark de ingestão e de latência da API com serviços externos simulados.
+
+Uso: python -m benchmark.executar --help
+"""
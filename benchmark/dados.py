@@ -0,0 +1,54 @@
+"""Geração de dados sintéticos reproduzíveis: árvore de pastas e SIPs em disco."""
+import os
+import random
+import uuid
+
+EXTENSOES = [".docx", ".pdf", ".txt", ".odt", ".jpg", ".dwg"]
+
+
+def gerar_arvore_pastas(main, largura: int, profundidade: int) -> list:
+    """Cria `largura` pastas por nível até `profundidade` níveis e retorna os ids de todas."""
+    db = main.SessionLocal()
+    try:
+        ids, nivel = [], [None]
+        for _ in range(profundidade):
+            proximo = []
+            for pai in nivel:
+                for indice in range(largura):
+                    pasta = main.models.TpPasta(cod_id=str(uuid.uuid4()), nom_pasta=f"pasta_{indice}", cod_pai=pai.cod_id if pai else None)
+                    main.definir_caminho_pasta(pasta, pai)
+                    db.add(pasta)
+                    proximo.append(pasta)
+            db.flush()
+            ids.extend(pasta.cod_id for pasta in proximo)
+            nivel = proximo
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+
+def gerar_sips(diretorio: str, quantidade: int, arquivos_por_sip: int, tamanho_medio: int,
+               proporcao_duplicados: float, rng: random.Random) -> list:
+    """Escreve `quantidade` SIPs em `diretorio` e retorna os transfer ids.
+
+    Os tamanhos variam entre metade e uma vez e meia `tamanho_medio`. Uma
+    fração `proporcao_duplicados` dos arquivos repete o conteúdo de um pequeno
+    conjunto de modelos, como formulários padrão reenviados.
+    """
+    modelos = [rng.randbytes(max(1, tamanho_medio)) for _ in range(8)]
+    transfer_ids = []
+    for _ in range(quantidade):
+        transfer_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        pasta_sip = os.path.join(diretorio, transfer_id)
+        os.makedirs(pasta_sip)
+        for indice in range(arquivos_por_sip):
+            extensao = rng.choice(EXTENSOES)
+            if rng.random() < proporcao_duplicados:
+                conteudo = rng.choice(modelos)
+            else:
+                conteudo = rng.randbytes(max(1, int(tamanho_medio * rng.uniform(0.5, 1.5))))
+            with open(os.path.join(pasta_sip, f"documento_{indice:04d}{extensao}"), "wb") as f:
+                f.write(conteudo)
+        transfer_ids.append(transfer_id)
+    return transfer_ids
@@ -0,0 +1,251 @@
+"""Executa o benchmark de ingestão e de latência da API e grava o resultado em JSON.
+
+Storage e Mapoteca são substituídos por servidores falsos locais, o
+conversor pelo backend 'simulado' e o banco, por padrão, por um SQLite
+temporário. O Redis não é usado: as transferências são processadas chamando
+processar_transferencia diretamente, com INGEST_WORKERS em paralelo.
+
+    python -m benchmark.executar --transferencias 100 --arquivos-por-sip 20 --saida resultado.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from benchmark import dados, servicos_falsos
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def pico_rss_bytes() -> int:
+    # ru_maxrss é informado em KiB no Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configurar_ambiente(args, diretorio: str, porta_falsos: int):
+    """Variáveis lidas por main/storage/conversor na importação; precisa rodar antes de importar main."""
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(diretorio, 'benchmark.sqlite')}"
+    os.environ["MINIO_SERVICE_API_URL"] = f"http://127.0.0.1:{porta_falsos}"
+    os.environ["MAPOTECA_SERVICE_URL"] = f"http://127.0.0.1:{porta_falsos}/internal/processing-complete"
+    os.environ["SIP_LOCATION_INSIDE_CONTAINER"] = os.path.join(diretorio, "sips")
+    os.environ["NORMALIZED_OUTPUT_DIR"] = os.path.join(diretorio, "normalizados")
+    os.environ["UPLOAD_ESTADO_DIR"] = os.path.join(diretorio, "uploads_em_partes")
+    os.environ["CONVERSOR_BACKEND"] = "simulado"
+    os.environ["CONVERSOR_SIMULADO_ATRASO"] = str(args.atraso_conversao)
+    os.environ["INGEST_WORKERS"] = str(args.workers)
+    # O benchmark cria o schema e chama processar_transferencia direto; a API sobe sem consumidor.
+    os.environ["API_CONSUMIDOR_ATIVO"] = "0"
+    os.environ["API_PREPARAR_SCHEMA"] = "0"
+    if args.redis_host:
+        os.environ["REDIS_HOST"], os.environ["REDIS_PORT"] = args.redis_host, str(args.redis_port)
+    else:
+        os.environ["CACHE_ATIVO"] = "0"
+
+
+def medir_ingestao(main, transfer_ids: list, pastas: list, rng: random.Random, workers: int) -> dict:
+    mensagens = [{"transferId": transfer_id, "pastaId": rng.choice(pastas) if pastas else None} for transfer_id in transfer_ids]
+    arquivos = sum(len(os.listdir(os.path.join(main.SIP_LOCATION_INSIDE_CONTAINER, t))) for t in transfer_ids)
+    bytes_totais = sum(
+        os.path.getsize(os.path.join(main.SIP_LOCATION_INSIDE_CONTAINER, t, nome))
+        for t in transfer_ids for nome in os.listdir(os.path.join(main.SIP_LOCATION_INSIDE_CONTAINER, t))
+    )
+
+    falhas = []
+
+    def processar(mensagem):
+        try:
+            main.processar_transferencia(mensagem)
+        except Exception as e:
+            falhas.append(f"{mensagem['transferId']}: {e}")
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(processar, mensagens))
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "transferencias": len(mensagens),
+        "arquivos": arquivos,
+        "bytes": bytes_totais,
+        "falhas": len(falhas),
+        "exemplos_de_falha": falhas[:5],
+        "duracao_s": duracao,
+        "transferencias_por_s": len(mensagens) / duracao,
+        "arquivos_por_s": arquivos / duracao,
+        "mb_por_s": bytes_totais / duracao / (1024 * 1024),
+        "pico_rss_bytes": pico_rss_bytes(),
+    }
+
+
+def iniciar_api(main, porta: int):
+    import uvicorn
+
+    servidor = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=porta, log_level="warning"))
+    thread = threading.Thread(target=servidor.run, daemon=True)
+    thread.start()
+    limite = time.monotonic() + 30
+    while not servidor.started:
+        if time.monotonic() > limite:
+            raise RuntimeError("A API não iniciou em 30s")
+        time.sleep(0.05)
+    return servidor, thread
+
+
+def medir_endpoint(url_base: str, caminhos: list, concorrencia: int) -> dict:
+    import httpx
+
+    latencias, erros = [], 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def requisitar(caminho):
+        nonlocal erros
+        if not hasattr(local, "cliente"):
+            local.cliente = httpx.Client(base_url=url_base, timeout=60)
+        inicio = time.perf_counter()
+        resposta = local.cliente.get(caminho)
+        duracao = time.perf_counter() - inicio
+        with lock:
+            latencias.append(duracao)
+            if resposta.status_code >= 400:
+                erros += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(requisitar, caminhos))
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "requisicoes": len(caminhos),
+        "erros": erros,
+        "requisicoes_por_s": len(caminhos) / duracao,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "max_ms": max(latencias) * 1000,
+    }
+
+
+def medir_api(main, transfer_ids: list, pastas: list, rng: random.Random, requisicoes: int, concorrencia: int) -> dict:
+    porta = porta_livre()
+    servidor, thread = iniciar_api(main, porta)
+    url_base = f"http://127.0.0.1:{porta}"
+    cenarios = {
+        "GET /aips": ["/aips?limite=100"] * requisicoes,
+        "GET /aips/{id}/details": [f"/aips/{rng.choice(transfer_ids)}/details" for _ in range(requisicoes)],
+        "GET /pastas/": ["/pastas/"] * requisicoes,
+        "GET /pastas/{id}": [f"/pastas/{rng.choice(pastas)}" for _ in range(requisicoes)] if pastas else [],
+    }
+    try:
+        resultados = {}
+        for nome, caminhos in cenarios.items():
+            if caminhos:
+                print(f"--- Benchmark: {nome} ({len(caminhos)} requisições, concorrência {concorrencia}) ---")
+                resultados[nome] = medir_endpoint(url_base, caminhos, concorrencia)
+        return resultados
+    finally:
+        servidor.should_exit = True
+        thread.join(timeout=10)
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transferencias", type=int, default=50)
+    parser.add_argument("--arquivos-por-sip", type=int, default=10)
+    parser.add_argument("--tamanho-arquivo", type=int, default=64 * 1024, help="tamanho médio dos arquivos em bytes")
+    parser.add_argument("--duplicados", type=float, default=0.2, help="fração de arquivos com conteúdo repetido")
+    parser.add_argument("--pastas-largura", type=int, default=5, help="pastas por nível da árvore")
+    parser.add_argument("--pastas-profundidade", type=int, default=3, help="níveis da árvore de pastas")
+    parser.add_argument("--workers", type=int, default=4, help="transferências processadas em paralelo (INGEST_WORKERS)")
+    parser.add_argument("--atraso-conversao", type=float, default=0.05, help="segundos por conversão no conversor simulado")
+    parser.add_argument("--latencia-storage", type=float, default=0.0, help="segundos adicionados a cada requisição ao storage falso")
+    parser.add_argument("--falha-partes", type=float, default=0.0, help="fração dos envios de parte que o storage falso recusa com 503")
+    parser.add_argument("--requisicoes", type=int, default=200, help="requisições por endpoint")
+    parser.add_argument("--concorrencia", type=int, default=8, help="clientes simultâneos por endpoint")
+    parser.add_argument("--database-url", help="banco a usar (padrão: SQLite temporário); o schema é criado se necessário")
+    parser.add_argument("--redis-host", help="ativa o cache de respostas usando este Redis (padrão: cache desligado)")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default="benchmark_resultado.json")
+    parser.add_argument("--manter-arquivos", action="store_true", help="não apaga o diretório temporário ao final")
+    args = parser.parse_args(argv)
+
+    diretorio = tempfile.mkdtemp(prefix="benchmark_gestao_")
+    porta_falsos = porta_livre()
+    falsos = servicos_falsos.iniciar(porta_falsos, args.latencia_storage, args.falha_partes)
+    configurar_ambiente(args, diretorio, porta_falsos)
+    rng = random.Random(args.semente)
+
+    try:
+        import main
+
+        main.preparar_schema()
+        os.makedirs(main.SIP_LOCATION_INSIDE_CONTAINER, exist_ok=True)
+
+        print(f"--- Benchmark: gerando {args.pastas_largura}^{args.pastas_profundidade} pastas e {args.transferencias} SIPs ---")
+        pastas = dados.gerar_arvore_pastas(main, args.pastas_largura, args.pastas_profundidade)
+        transfer_ids = dados.gerar_sips(
+            main.SIP_LOCATION_INSIDE_CONTAINER, args.transferencias, args.arquivos_por_sip,
+            args.tamanho_arquivo, args.duplicados, rng,
+        )
+
+        print(f"--- Benchmark: ingestão com {args.workers} workers ---")
+        ingestao = medir_ingestao(main, transfer_ids, pastas, rng, args.workers)
+        api = medir_api(main, transfer_ids, pastas, rng, args.requisicoes, args.concorrencia)
+        main.conversor.encerrar_pool()
+
+        resultado = {
+            "data": datetime.now(timezone.utc).isoformat(),
+            "commit": commit_atual(),
+            "python": sys.version.split()[0],
+            "banco": main.engine.dialect.name,
+            "parametros": vars(args),
+            "pastas": len(pastas),
+            "ingestao": ingestao,
+            "api": api,
+            "pico_rss_bytes": pico_rss_bytes(),
+        }
+    finally:
+        falsos.terminate()
+        if not args.manter_arquivos:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+    with open(args.saida, "w") as f:
+        json.dump(resultado, f, indent=2)
+
+    print(f"\nIngestão: {ingestao['transferencias_por_s']:.2f} transferências/s, {ingestao['arquivos_por_s']:.1f} arquivos/s, "
+          f"{ingestao['mb_por_s']:.2f} MB/s ({ingestao['falhas']} falhas)")
+    for nome, medida in api.items():
+        print(f"{nome}: p50 {medida['p50_ms']:.1f} ms, p99 {medida['p99_ms']:.1f} ms, {medida['requisicoes_por_s']:.0f} req/s ({medida['erros']} erros)")
+    print(f"Pico de RSS: {resultado['pico_rss_bytes'] / (1024 * 1024):.1f} MiB")
+    print(f"Resultado gravado em {args.saida}")
+
+
+if __name__ == "__main__":
+    main_cli()
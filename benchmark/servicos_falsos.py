@@ -0,0 +1,161 @@
+"""Substitutos locais do microsserviço de storage e do Mapoteca.
+
+Rodam em um processo separado para que o RSS medido no benchmark seja só o
+do serviço. O storage falso lê e descarta o corpo dos uploads (em blocos,
+sem guardá-lo em memória), guarda o tamanho de cada objeto para responder a
+`/storage/metadata` e pode simular latência de rede.
+
+Também atende o upload em partes (`/storage/multipart`): confere o SHA-256
+de cada parte, lista as partes recebidas para a retomada e, ao completar,
+exige todas as partes com o tamanho anunciado. Com `falha_partes`, uma
+fração dos PUTs de parte responde 503, para exercitar as repetições; com
+`multipart=False`, o storage responde 404 ao upload em partes, como um
+serviço que não o oferece.
+"""
+import hashlib
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TAMANHO_BLOCO = 1024 * 1024
+
+
+class ServidorFalso(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latencia = 0.0
+    falha_partes = 0.0
+    multipart = True
+    uploads = {}
+    uploads_lock = threading.Lock()
+
+    def _responder(self, status: int, corpo: dict):
+        bruto = json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(bruto)))
+        self.end_headers()
+        self.wfile.write(bruto)
+
+    def _ler_corpo(self) -> bytes:
+        """Lê o corpo inteiro; de /storage/upload guarda só o início, com os cabeçalhos das partes."""
+        restante = int(self.headers.get("Content-Length", 0))
+        inicio = b""
+        while restante > 0:
+            bloco = self.rfile.read(min(TAMANHO_BLOCO, restante))
+            if not bloco:
+                break
+            restante -= len(bloco)
+            if self.path != "/storage/upload":
+                inicio += bloco
+            elif len(inicio) < 64 * 1024:
+                inicio += bloco[:64 * 1024]
+        return inicio
+
+    def _ler_parte(self):
+        """Lê o corpo de uma parte, retornando (tamanho, sha256)."""
+        restante = int(self.headers.get("Content-Length", 0))
+        sha256_hash = hashlib.sha256()
+        tamanho = 0
+        while restante > 0:
+            bloco = self.rfile.read(min(TAMANHO_BLOCO, restante))
+            if not bloco:
+                break
+            restante -= len(bloco)
+            tamanho += len(bloco)
+            sha256_hash.update(bloco)
+        return tamanho, sha256_hash.hexdigest()
+
+    def do_GET(self):
+        encontrado = re.fullmatch(r"/storage/multipart/([0-9a-f]+)", self.path)
+        upload = self.uploads.get(encontrado.group(1)) if encontrado else None
+        if upload is None:
+            self._responder(404, {"error": "upload não encontrado"})
+            return
+        with self.uploads_lock:
+            partes = [{"partNumber": numero, "etag": etag, "size": tamanho} for numero, (tamanho, etag) in sorted(upload["partes"].items())]
+        self._responder(200, {"uploadId": encontrado.group(1), "parts": partes})
+
+    def do_PUT(self):
+        if self.latencia:
+            time.sleep(self.latencia)
+        encontrado = re.fullmatch(r"/storage/multipart/([0-9a-f]+)/parts/(\d+)", self.path)
+        tamanho, checksum = self._ler_parte()
+        upload = self.uploads.get(encontrado.group(1)) if encontrado else None
+        if upload is None:
+            self._responder(404, {"error": "upload não encontrado"})
+        elif random.random() < self.falha_partes:
+            self._responder(503, {"error": "falha simulada"})
+        elif self.headers.get("X-Checksum-Sha256") not in (None, checksum):
+            self._responder(400, {"error": "checksum da parte não confere"})
+        else:
+            with self.uploads_lock:
+                upload["partes"][int(encontrado.group(2))] = (tamanho, checksum)
+            self._responder(200, {"etag": checksum})
+
+    def do_POST(self):
+        if self.latencia:
+            time.sleep(self.latencia)
+        corpo = self._ler_corpo()
+        if self.path.startswith("/storage/multipart") and not self.multipart:
+            self._responder(404, {"error": "Cannot POST " + self.path})
+        elif self.path == "/storage/multipart":
+            pedido = json.loads(corpo)
+            upload_id = uuid.uuid4().hex
+            with self.uploads_lock:
+                self.uploads[upload_id] = {"pedido": pedido, "partes": {}}
+            self._responder(201, {"uploadId": upload_id})
+        elif self.path.startswith("/storage/multipart/") and self.path.endswith("/complete"):
+            upload = self.uploads.get(self.path.split("/")[3])
+            if upload is None:
+                self._responder(404, {"error": "upload não encontrado"})
+                return
+            pedido, partes = upload["pedido"], json.loads(corpo)["parts"]
+            with self.uploads_lock:
+                recebidas = dict(upload["partes"])
+            if any(recebidas.get(parte["partNumber"], (0, None))[1] != parte["etag"] for parte in partes) \
+                    or sum(recebidas[parte["partNumber"]][0] for parte in partes) != pedido["size"]:
+                self._responder(409, {"error": "partes incompletas"})
+                return
+            self._responder(201, {"uploaded": [pedido["fileName"]]})
+        elif self.path == "/storage/upload":
+            nomes = re.findall(rb'filename="([^"]*)"', corpo)
+            self._responder(201, {"uploaded": [nome.decode("utf-8", "replace") for nome in nomes]})
+        elif self.path == "/storage/metadata":
+            pedido = json.loads(corpo or b"{}")
+            self._responder(200, {
+                "size": len(pedido.get("path", "")) * 100,
+                "lastModified": datetime.now(timezone.utc).isoformat(),
+            })
+        else:
+            # Mapoteca: /internal/processing-complete
+            self._responder(200, {"ok": True})
+
+    def log_message(self, *args):
+        pass
+
+
+def _servir(porta: int, latencia: float, falha_partes: float, multipart: bool, pronto):
+    ServidorFalso.latencia = latencia
+    ServidorFalso.falha_partes = falha_partes
+    ServidorFalso.multipart = multipart
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), ServidorFalso)
+    servidor.daemon_threads = True
+    pronto.set()
+    servidor.serve_forever()
+
+
+def iniciar(porta: int, latencia: float = 0.0, falha_partes: float = 0.0, multipart: bool = True) -> multiprocessing.Process:
+    """Sobe storage e Mapoteca falsos em 127.0.0.1:<porta> e retorna o processo."""
+    pronto = multiprocessing.Event()
+    processo = multiprocessing.Process(target=_servir, args=(porta, latencia, falha_partes, multipart, pronto), daemon=True)
+    processo.start()
+    if not pronto.wait(10):
+        processo.terminate()
+        raise RuntimeError(f"Servidor falso não iniciou na porta {porta}")
+    return processo
@@ -0,0 +1,219 @@
+"""Cache de respostas da API no Redis.
+
+As leituras mais frequentes (localização e detalhes de AIP, listagem e
+conteúdo de pastas) são guardadas como JSON com TTL de CACHE_TTL segundos.
+Além do TTL, o cache mantém um índice LRU (sorted set com o último acesso de
+cada chave) e o tamanho de cada valor: quando o total passa de
+CACHE_MAX_BYTES, as chaves menos usadas são removidas. Valores maiores que
+CACHE_MAX_ITEM_BYTES não são guardados. A contabilidade de bytes é
+aproximada, já que chaves que expiram pelo TTL só saem do índice quando são
+despejadas.
+
+Os caminhos de escrita invalidam as chaves afetadas explicitamente. Falhas
+de comunicação com o Redis nunca derrubam a requisição: o cache se comporta
+como um miss.
+
+Os endpoints de leitura assíncronos usam CacheRespostasAsync (redis.asyncio)
+sobre as mesmas chaves, para não ocupar o threadpool a cada consulta.
+"""
+import json
+import os
+import time
+
+import redis
+import redis.asyncio
+from fastapi.encoders import jsonable_encoder
+
+CACHE_ATIVO = os.environ.get("CACHE_ATIVO", "1") == "1"
+CACHE_TTL = int(os.environ.get("CACHE_TTL", 60))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_MAX_ITEM_BYTES = int(os.environ.get("CACHE_MAX_ITEM_BYTES", 1024 * 1024))
+CACHE_REDIS_TIMEOUT = float(os.environ.get("CACHE_REDIS_TIMEOUT", 0.5))
+
+PREFIXO = "gestao:cache:"
+INDICE_LRU = PREFIXO + "__lru"
+TAMANHOS = PREFIXO + "__tamanhos"
+TOTAL_BYTES = PREFIXO + "__bytes"
+ESTATISTICAS = PREFIXO + "__stats"
+LOTE_INVALIDACAO = 500
+
+
+def chave_aip_location(transfer_id: str) -> str:
+    return f"aip:{transfer_id}:location"
+
+
+def chave_aip_details(transfer_id: str) -> str:
+    return f"aip:{transfer_id}:details"
+
+
+def chaves_aip(transfer_id: str) -> list:
+    return [chave_aip_location(transfer_id), chave_aip_details(transfer_id)]
+
+
+CHAVE_LISTA_PASTAS = "pastas:lista"
+
+
+def chave_pasta(pasta_id: str) -> str:
+    return f"pasta:{pasta_id}"
+
+
+def serializar(valor):
+    """JSON do valor, ou None se passar de CACHE_MAX_ITEM_BYTES."""
+    bruto = json.dumps(jsonable_encoder(valor)).encode("utf-8")
+    return bruto if len(bruto) <= CACHE_MAX_ITEM_BYTES else None
+
+
+class CacheRespostas:
+    def __init__(self, cliente: redis.Redis, ativo: bool = CACHE_ATIVO):
+        self.cliente = cliente
+        self.ativo = ativo
+
+    def obter(self, chave: str):
+        if not self.ativo:
+            return None
+        try:
+            bruto = self.cliente.get(PREFIXO + chave)
+            pipe = self.cliente.pipeline(transaction=False)
+            if bruto is None:
+                pipe.hincrby(ESTATISTICAS, "misses", 1)
+            else:
+                pipe.hincrby(ESTATISTICAS, "hits", 1)
+                pipe.zadd(INDICE_LRU, {chave: time.time()}, xx=True)
+            pipe.execute()
+            return None if bruto is None else json.loads(bruto)
+        except redis.exceptions.RedisError as e:
+            print(f"AVISO: Cache indisponível na leitura de '{chave}': {e}")
+            return None
+
+    def gravar(self, chave: str, valor):
+        if not self.ativo:
+            return
+        bruto = serializar(valor)
+        if bruto is None:
+            return
+        try:
+            tamanho_anterior = int(self.cliente.hget(TAMANHOS, chave) or 0)
+            pipe = self.cliente.pipeline(transaction=False)
+            pipe.set(PREFIXO + chave, bruto, ex=CACHE_TTL)
+            pipe.zadd(INDICE_LRU, {chave: time.time()})
+            pipe.hset(TAMANHOS, chave, len(bruto))
+            pipe.incrby(TOTAL_BYTES, len(bruto) - tamanho_anterior)
+            total = pipe.execute()[-1]
+            if total > CACHE_MAX_BYTES:
+                self._liberar_espaco()
+        except redis.exceptions.RedisError as e:
+            print(f"AVISO: Cache indisponível na gravação de '{chave}': {e}")
+
+    def _liberar_espaco(self):
+        while int(self.cliente.get(TOTAL_BYTES) or 0) > CACHE_MAX_BYTES:
+            menos_usadas = self.cliente.zpopmin(INDICE_LRU, 16)
+            if not menos_usadas:
+                self.cliente.set(TOTAL_BYTES, 0)
+                return
+            chaves = [chave.decode("utf-8") for chave, _ in menos_usadas]
+            liberados = self._remover(chaves)
+            self.cliente.hincrby(ESTATISTICAS, "evictions", len(chaves))
+            if not liberados:
+                return
+
+    def _remover(self, chaves: list) -> int:
+        tamanhos = self.cliente.hmget(TAMANHOS, chaves)
+        liberados = sum(int(tamanho or 0) for tamanho in tamanhos)
+        pipe = self.cliente.pipeline(transaction=False)
+        pipe.delete(*[PREFIXO + chave for chave in chaves])
+        pipe.zrem(INDICE_LRU, *chaves)
+        pipe.hdel(TAMANHOS, *chaves)
+        pipe.decrby(TOTAL_BYTES, liberados)
+        pipe.execute()
+        return liberados
+
+    def invalidar(self, *chaves: str):
+        if not self.ativo or not chaves:
+            return
+        try:
+            for inicio in range(0, len(chaves), LOTE_INVALIDACAO):
+                self._remover(list(chaves[inicio:inicio + LOTE_INVALIDACAO]))
+        except redis.exceptions.RedisError as e:
+            print(f"AVISO: Falha ao invalidar {len(chaves)} chave(s) do cache: {e}")
+
+    def estatisticas(self) -> dict:
+        try:
+            stats = {k.decode("utf-8"): int(v) for k, v in self.cliente.hgetall(ESTATISTICAS).items()}
+            hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+            return {
+                "ativo": self.ativo,
+                "hits": hits,
+                "misses": misses,
+                "evictions": stats.get("evictions", 0),
+                "taxa_acerto": hits / (hits + misses) if hits + misses else 0.0,
+                "chaves": self.cliente.zcard(INDICE_LRU),
+                "bytes": int(self.cliente.get(TOTAL_BYTES) or 0),
+                "max_bytes": CACHE_MAX_BYTES,
+            }
+        except redis.exceptions.RedisError as e:
+            return {"ativo": self.ativo, "erro": str(e)}
+
+
+class CacheRespostasAsync:
+    """Leitura e gravação do cache pelos endpoints async, com o mesmo índice LRU e contabilidade de CacheRespostas."""
+
+    def __init__(self, cliente: redis.asyncio.Redis, ativo: bool = CACHE_ATIVO):
+        self.cliente = cliente
+        self.ativo = ativo
+
+    async def obter(self, chave: str):
+        if not self.ativo:
+            return None
+        try:
+            bruto = await self.cliente.get(PREFIXO + chave)
+            pipe = self.cliente.pipeline(transaction=False)
+            if bruto is None:
+                pipe.hincrby(ESTATISTICAS, "misses", 1)
+            else:
+                pipe.hincrby(ESTATISTICAS, "hits", 1)
+                pipe.zadd(INDICE_LRU, {chave: time.time()}, xx=True)
+            await pipe.execute()
+            return None if bruto is None else json.loads(bruto)
+        except redis.exceptions.RedisError as e:
+            print(f"AVISO: Cache indisponível na leitura de '{chave}': {e}")
+            return None
+
+    async def gravar(self, chave: str, valor):
+        if not self.ativo:
+            return
+        bruto = serializar(valor)
+        if bruto is None:
+            return
+        try:
+            tamanho_anterior = int(await self.cliente.hget(TAMANHOS, chave) or 0)
+            pipe = self.cliente.pipeline(transaction=False)
+            pipe.set(PREFIXO + chave, bruto, ex=CACHE_TTL)
+            pipe.zadd(INDICE_LRU, {chave: time.time()})
+            pipe.hset(TAMANHOS, chave, len(bruto))
+            pipe.incrby(TOTAL_BYTES, len(bruto) - tamanho_anterior)
+            total = (await pipe.execute())[-1]
+            if total > CACHE_MAX_BYTES:
+                await self._liberar_espaco()
+        except redis.exceptions.RedisError as e:
+            print(f"AVISO: Cache indisponível na gravação de '{chave}': {e}")
+
+    async def _liberar_espaco(self):
+        while int(await self.cliente.get(TOTAL_BYTES) or 0) > CACHE_MAX_BYTES:
+            menos_usadas = await self.cliente.zpopmin(INDICE_LRU, 16)
+            if not menos_usadas:
+                await self.cliente.set(TOTAL_BYTES, 0)
+                return
+            chaves = [chave.decode("utf-8") for chave, _ in menos_usadas]
+            tamanhos = await self.cliente.hmget(TAMANHOS, chaves)
+            liberados = sum(int(tamanho or 0) for tamanho in tamanhos)
+            pipe = self.cliente.pipeline(transaction=False)
+            pipe.delete(*[PREFIXO + chave for chave in chaves])
+            pipe.hdel(TAMANHOS, *chaves)
+            pipe.decrby(TOTAL_BYTES, liberados)
+            pipe.hincrby(ESTATISTICAS, "evictions", len(chaves))
+            await pipe.execute()
+            if not liberados:
+                return
+
+    async def fechar(self):
+        await self.cliente.aclose()
@@ -0,0 +1,259 @@
+"""Consumo da fila de ingestão via Redis Streams com consumer groups.
+
+Com INGEST_MODO=stream, várias réplicas do serviço leem o mesmo stream em um
+grupo (XREADGROUP) e cada mensagem só sai do stream depois de processada
+(XACK + XDEL). Uma réplica que morre no meio de uma transferência deixa a
+mensagem pendente; depois de STREAM_CLAIM_IDLE_MS sem sinal de vida ela é
+reivindicada por outra réplica (XAUTOCLAIM). Enquanto processa, o consumidor
+renova periodicamente as mensagens em andamento para que não sejam tomadas
+por engano.
+
+Falhas são reprocessadas até STREAM_MAX_TENTATIVAS vezes, com backoff
+exponencial com jitter: a mensagem sai do stream e aguarda no sorted set
+`<stream>:retry` até o horário da nova tentativa. Ao esgotar as tentativas,
+ou se a mensagem for ilegível, ela vai para o stream `<stream>:dlq` com o
+motivo da falha.
+
+O produtor publica cada transferência com `XADD <stream> * payload <json>`,
+usando o mesmo JSON enviado hoje para a lista.
+"""
+import json
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+
+STREAM_GRUPO = os.environ.get("STREAM_GRUPO", "gestao-dados")
+STREAM_CONSUMIDOR = os.environ.get("STREAM_CONSUMIDOR", f"{socket.gethostname()}-{os.getpid()}")
+STREAM_MAX_TENTATIVAS = int(os.environ.get("STREAM_MAX_TENTATIVAS", 3))
+STREAM_BACKOFF_BASE = float(os.environ.get("STREAM_BACKOFF_BASE", 5))
+STREAM_BACKOFF_MAX = float(os.environ.get("STREAM_BACKOFF_MAX", 300))
+STREAM_CLAIM_IDLE_MS = int(os.environ.get("STREAM_CLAIM_IDLE_MS", 300000))
+STREAM_BLOQUEIO_MS = 5000
+STREAM_DLQ_MAXLEN = 10000
+LOTE_RETRY = 100
+
+CAMPO_PAYLOAD = b"payload"
+CAMPO_TENTATIVA = b"tentativa"
+
+
+class MensagemInvalida(Exception):
+    """A mensagem não pode ser processada em nenhuma tentativa; vai direto para a DLQ."""
+
+
+class ConsumidorStream:
+    """Lê um stream em consumer group e despacha as mensagens para um pool de threads.
+
+    `processar(payload)` recebe o campo `payload` da mensagem e deve lançar
+    uma exceção em caso de falha. `ao_desistir(payload, erro)` é chamado
+    quando a mensagem vai para a DLQ.
+    """
+
+    def __init__(self, cliente: redis.Redis, stream: str, processar, ao_desistir, max_em_andamento: int,
+                 parar: threading.Event, grupo: str = STREAM_GRUPO, consumidor: str = STREAM_CONSUMIDOR):
+        self.cliente = cliente
+        self.stream = stream
+        self.grupo = grupo
+        self.consumidor = consumidor
+        self.processar = processar
+        self.ao_desistir = ao_desistir
+        self.max_em_andamento = max_em_andamento
+        self.parar = parar
+        self.chave_retry = f"{stream}:retry"
+        self.chave_dlq = f"{stream}:dlq"
+        self._em_andamento = set()
+        self._lock = threading.Lock()
+        self._cursor_claim = "0-0"
+        self._proxima_manutencao = 0.0
+
+    def garantir_grupo(self):
+        try:
+            self.cliente.xgroup_create(self.stream, self.grupo, id="0", mkstream=True)
+            print(f">>> Consumidor: grupo '{self.grupo}' criado no stream '{self.stream}'.")
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def executar(self):
+        self.garantir_grupo()
+        print(f">>> Consumidor: '{self.consumidor}' lendo o stream '{self.stream}' no grupo '{self.grupo}'. Aguardando tarefas... <<<")
+
+        vagas = threading.BoundedSemaphore(self.max_em_andamento)
+        with ThreadPoolExecutor(max_workers=self.max_em_andamento, thread_name_prefix="ingest") as executor:
+            while not self.parar.is_set():
+                try:
+                    self._manutencao()
+                except redis.exceptions.RedisError as e:
+                    print(f"ERRO na manutenção do stream '{self.stream}': {e}")
+
+                if not vagas.acquire(timeout=1):
+                    continue
+                livres = 1
+                while livres < self.max_em_andamento and vagas.acquire(blocking=False):
+                    livres += 1
+
+                try:
+                    mensagens = self._buscar(livres)
+                except redis.exceptions.RedisError as e:
+                    mensagens = []
+                    print(f"ERRO ao ler o stream '{self.stream}' no Redis: {e}. Tentando novamente em 5s...")
+                    self.parar.wait(5)
+
+                for id_mensagem, campos in mensagens:
+                    with self._lock:
+                        self._em_andamento.add(id_mensagem)
+                    future = executor.submit(self._executar_mensagem, id_mensagem, campos)
+                    future.add_done_callback(lambda _: vagas.release())
+                for _ in range(livres - len(mensagens)):
+                    vagas.release()
+
+            print("--- Consumidor Redis: aguardando as transferências em andamento... ---")
+
+    # Leitura
+    def _buscar(self, quantidade: int) -> list:
+        """Prioriza mensagens abandonadas por outros consumidores; depois, mensagens novas."""
+        reivindicadas = self._reivindicar(quantidade)
+        if reivindicadas:
+            return reivindicadas
+        resposta = self.cliente.xreadgroup(self.grupo, self.consumidor, {self.stream: ">"}, count=quantidade, block=STREAM_BLOQUEIO_MS)
+        return [mensagem for _, mensagens in resposta or [] for mensagem in mensagens]
+
+    def _reivindicar(self, quantidade: int) -> list:
+        resposta = self.cliente.xautoclaim(
+            self.stream, self.grupo, self.consumidor, STREAM_CLAIM_IDLE_MS, start_id=self._cursor_claim, count=quantidade,
+        )
+        self._cursor_claim = resposta[0]
+        mensagens = []
+        for id_mensagem, campos in resposta[1]:
+            if campos is None:
+                continue
+            entregas = self._entregas(id_mensagem)
+            print(f"    -> Consumidor: mensagem {self._texto(id_mensagem)} reivindicada de um consumidor inativo ({entregas}ª entrega).")
+            if self._tentativa(campos) + entregas - 1 > STREAM_MAX_TENTATIVAS:
+                # A mensagem derrubou os consumidores anteriores; não tenta de novo.
+                self._mover_para_dlq(id_mensagem, campos, f"Abandonada após {entregas} entregas sem confirmação.")
+                continue
+            mensagens.append((id_mensagem, campos))
+        return mensagens
+
+    def _entregas(self, id_mensagem) -> int:
+        pendentes = self.cliente.xpending_range(self.stream, self.grupo, min=id_mensagem, max=id_mensagem, count=1)
+        return pendentes[0]["times_delivered"] if pendentes else 1
+
+    # Processamento
+    def _executar_mensagem(self, id_mensagem, campos: dict):
+        try:
+            payload = campos.get(CAMPO_PAYLOAD)
+            if payload is None:
+                raise MensagemInvalida("Mensagem sem o campo 'payload'.")
+            self.processar(payload)
+        except MensagemInvalida as e:
+            self._registrar_falha(id_mensagem, campos, e, definitiva=True)
+        except Exception as e:
+            self._registrar_falha(id_mensagem, campos, e)
+        else:
+            self._confirmar(id_mensagem)
+        finally:
+            with self._lock:
+                self._em_andamento.discard(id_mensagem)
+
+    def _confirmar(self, id_mensagem):
+        pipe = self.cliente.pipeline(transaction=True)
+        pipe.xack(self.stream, self.grupo, id_mensagem)
+        pipe.xdel(self.stream, id_mensagem)
+        pipe.execute()
+
+    def _registrar_falha(self, id_mensagem, campos: dict, erro: Exception, definitiva: bool = False):
+        tentativa = self._tentativa(campos)
+        try:
+            if definitiva or tentativa >= STREAM_MAX_TENTATIVAS:
+                self._mover_para_dlq(id_mensagem, campos, str(erro))
+            else:
+                self._agendar_retry(id_mensagem, campos, tentativa, str(erro))
+        except redis.exceptions.RedisError as e:
+            # A mensagem continua pendente e será reivindicada depois de STREAM_CLAIM_IDLE_MS.
+            print(f"ERRO ao registrar a falha da mensagem {self._texto(id_mensagem)} no Redis: {e}")
+
+    def _agendar_retry(self, id_mensagem, campos: dict, tentativa: int, erro: str):
+        atraso = min(STREAM_BACKOFF_MAX, STREAM_BACKOFF_BASE * 2 ** (tentativa - 1))
+        atraso *= random.uniform(0.5, 1.0)
+        nova = {chave.decode("utf-8"): valor.decode("utf-8") for chave, valor in campos.items()}
+        nova["tentativa"] = str(tentativa + 1)
+        nova["ultimo_erro"] = erro
+        print(f"    -> Consumidor: tentativa {tentativa}/{STREAM_MAX_TENTATIVAS} da mensagem {self._texto(id_mensagem)} falhou. Nova tentativa em {atraso:.0f}s.")
+
+        pipe = self.cliente.pipeline(transaction=True)
+        pipe.zadd(self.chave_retry, {json.dumps(nova, sort_keys=True): time.time() + atraso})
+        pipe.xack(self.stream, self.grupo, id_mensagem)
+        pipe.xdel(self.stream, id_mensagem)
+        pipe.execute()
+
+    def _mover_para_dlq(self, id_mensagem, campos: dict, erro: str):
+        tentativa = self._tentativa(campos)
+        print(f"    -> Consumidor: mensagem {self._texto(id_mensagem)} enviada para '{self.chave_dlq}' após {tentativa} tentativa(s). Motivo: {erro}")
+
+        morta = dict(campos)
+        morta[b"erro"] = erro
+        morta[b"id_original"] = id_mensagem
+        morta[CAMPO_TENTATIVA] = str(tentativa)
+        pipe = self.cliente.pipeline(transaction=True)
+        pipe.xadd(self.chave_dlq, morta, maxlen=STREAM_DLQ_MAXLEN, approximate=True)
+        pipe.xack(self.stream, self.grupo, id_mensagem)
+        pipe.xdel(self.stream, id_mensagem)
+        pipe.execute()
+
+        try:
+            self.ao_desistir(campos.get(CAMPO_PAYLOAD), erro)
+        except Exception as e:
+            print(f"ERRO ao notificar a desistência da mensagem {self._texto(id_mensagem)}: {e}")
+
+    # Manutenção periódica
+    def _manutencao(self):
+        agora = time.monotonic()
+        if agora < self._proxima_manutencao:
+            return
+        self._proxima_manutencao = agora + min(STREAM_CLAIM_IDLE_MS / 3000, 10)
+        self._renovar_em_andamento()
+        self._promover_retries()
+
+    def _renovar_em_andamento(self):
+        """Zera o tempo ocioso das mensagens em processamento para que não sejam reivindicadas."""
+        with self._lock:
+            ids = list(self._em_andamento)
+        if ids:
+            self.cliente.xclaim(self.stream, self.grupo, self.consumidor, 0, ids, justid=True)
+
+    def _promover_retries(self):
+        """Devolve ao stream as mensagens cujo backoff terminou.
+
+        ZREM e XADD rodam em uma transação vigiada (WATCH): se outra réplica
+        promover a mesma mensagem antes, a transação é descartada.
+        """
+        vencidas = self.cliente.zrangebyscore(self.chave_retry, 0, time.time(), start=0, num=LOTE_RETRY)
+        for membro in vencidas:
+            with self.cliente.pipeline(transaction=True) as pipe:
+                try:
+                    pipe.watch(self.chave_retry)
+                    if pipe.zscore(self.chave_retry, membro) is None:
+                        continue
+                    pipe.multi()
+                    pipe.zrem(self.chave_retry, membro)
+                    pipe.xadd(self.stream, json.loads(membro))
+                    pipe.execute()
+                except redis.exceptions.WatchError:
+                    continue
+
+    @staticmethod
+    def _tentativa(campos: dict) -> int:
+        try:
+            return int(campos.get(CAMPO_TENTATIVA, 1))
+        except ValueError:
+            return 1
+
+    @staticmethod
+    def _texto(id_mensagem) -> str:
+        return id_mensagem.decode("utf-8") if isinstance(id_mensagem, bytes) else str(id_mensagem)
@@ -0,0 +1,495 @@
+"""Pool de conversão de documentos para PDF.
+
+Mantém CONVERSOR_INSTANCIAS instâncias do LibreOffice aquecidas, cada uma
+ouvindo em uma porta UNO própria com uma conexão aberta, e distribui os documentos entre elas por
+uma fila. Uma instância que trava (estoura o timeout) ou morre é reiniciada
+antes de receber o próximo documento.
+
+O backend 'simulado' não depende do LibreOffice: gera um PDF mínimo e serve
+para testes e benchmarks da pipeline.
+
+CacheConversao guarda em disco os PDFs já gerados, endereçados pelo SHA-256
+do documento de origem e pela versão do conversor, para que documentos
+idênticos não passem de novo pelo LibreOffice.
+"""
+import hashlib
+import json
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+CONVERSOR_BACKEND = os.environ.get("CONVERSOR_BACKEND", "unoconv")
+CONVERSOR_INSTANCIAS = int(os.environ.get("CONVERSOR_INSTANCIAS", 2))
+CONVERSOR_TIMEOUT = int(os.environ.get("CONVERSOR_TIMEOUT", 120))
+CONVERSOR_TIMEOUT_INICIO = int(os.environ.get("CONVERSOR_TIMEOUT_INICIO", 60))
+CONVERSOR_PORTA_BASE = int(os.environ.get("CONVERSOR_PORTA_BASE", 2002))
+CONVERSOR_SIMULADO_ATRASO = float(os.environ.get("CONVERSOR_SIMULADO_ATRASO", 0))
+CACHE_CONVERSAO_ATIVO = os.environ.get("CACHE_CONVERSAO_ATIVO", "1") == "1"
+CACHE_CONVERSAO_MAX_BYTES = int(os.environ.get("CACHE_CONVERSAO_MAX_BYTES", 1024 * 1024 * 1024))
+
+PDF_SIMULADO = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+
+class ErroConversao(Exception):
+    """A conversão falhou; o documento segue sem versão normalizada."""
+
+
+class TimeoutConversao(ErroConversao):
+    """A instância não respondeu dentro do timeout e foi reiniciada."""
+
+
+_versao = None
+
+
+def versao_conversor() -> str:
+    """Identifica backend e versão do LibreOffice; entra na chave do cache de conversões."""
+    global _versao
+    if _versao is None:
+        versao = CONVERSOR_BACKEND
+        if CONVERSOR_BACKEND == "unoconv":
+            try:
+                saida = subprocess.run(["soffice", "--version"], capture_output=True, timeout=30, check=True).stdout
+                versao = f"{versao}:{saida.decode('utf-8', 'replace').strip()}"
+            except (OSError, subprocess.SubprocessError):
+                versao = f"{versao}:desconhecida"
+        _versao = versao
+    return _versao
+
+
+# Filtro de exportação para PDF de cada tipo de documento do LibreOffice, na
+# ordem em que são testados (uma planilha também suporta OfficeDocument).
+FILTROS_PDF = (
+    ("com.sun.star.text.GenericTextDocument", "writer_pdf_Export"),
+    ("com.sun.star.sheet.SpreadsheetDocument", "calc_pdf_Export"),
+    ("com.sun.star.presentation.PresentationDocument", "impress_pdf_Export"),
+    ("com.sun.star.drawing.DrawingDocument", "draw_pdf_Export"),
+)
+
+
+class InstanciaLibreOffice:
+    """Um processo soffice headless com perfil próprio e uma conexão UNO mantida aberta.
+
+    A conexão é aberta em iniciar() e reaproveitada por todas as conversões;
+    só é refeita quando a instância é reiniciada, após um travamento ou queda.
+    """
+
+    def __init__(self, indice: int, timeout: int = CONVERSOR_TIMEOUT):
+        self.indice = indice
+        self.porta = CONVERSOR_PORTA_BASE + indice
+        self.timeout = timeout
+        self.processo = None
+        self.perfil_dir = None
+        self.desktop = None
+
+    def __repr__(self):
+        return f"LibreOffice#{self.indice}(porta={self.porta})"
+
+    def iniciar(self):
+        # Cada instância precisa de um perfil de usuário separado; com o perfil
+        # compartilhado o segundo soffice apenas repassa o pedido ao primeiro.
+        self.perfil_dir = tempfile.mkdtemp(prefix=f"lo_perfil_{self.porta}_")
+        comando = [
+            "soffice", "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+            f"--accept=socket,host=127.0.0.1,port={self.porta};urp;StarOffice.ComponentContext",
+            f"-env:UserInstallation=file://{self.perfil_dir}",
+        ]
+        self.processo = subprocess.Popen(comando, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        limite = time.monotonic() + CONVERSOR_TIMEOUT_INICIO
+        while time.monotonic() < limite:
+            if self.processo.poll() is not None:
+                raise ErroConversao(f"{self} terminou durante a inicialização (código {self.processo.returncode})")
+            try:
+                self.desktop = self._conectar()
+                print(f"    -> Conversor: {self} pronto.")
+                return
+            except ErroConversao:
+                self.encerrar()
+                raise
+            except Exception:
+                # A porta abre antes de o soffice aceitar a conexão UNO.
+                time.sleep(0.5)
+        self.encerrar()
+        raise ErroConversao(f"{self} não aceitou a conexão UNO em {CONVERSOR_TIMEOUT_INICIO}s")
+
+    def _conectar(self):
+        try:
+            import uno
+        except ImportError:
+            raise ErroConversao("Módulo 'uno' indisponível; instale python3-uno ou use CONVERSOR_BACKEND=simulado")
+        local = uno.getComponentContext()
+        resolvedor = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        contexto = resolvedor.resolve(f"uno:socket,host=127.0.0.1,port={self.porta};urp;StarOffice.ComponentContext")
+        return contexto.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", contexto)
+
+    def ativa(self) -> bool:
+        return self.processo is not None and self.processo.poll() is None and self.desktop is not None
+
+    def converter(self, origem: str, destino: str):
+        # As chamadas UNO bloqueiam sem timeout próprio: a conversão roda em uma
+        # thread auxiliar e, se estourar o prazo, o pool reinicia a instância,
+        # o que encerra o soffice e libera a thread presa na conexão antiga.
+        resultado = {}
+        thread = threading.Thread(
+            target=self._converter_via_uno, args=(self.desktop, origem, destino, resultado),
+            name=f"uno-{self.indice}", daemon=True,
+        )
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            raise TimeoutConversao(f"{self} excedeu {self.timeout}s convertendo '{os.path.basename(origem)}'")
+        if "erro" in resultado:
+            erro = resultado["erro"]
+            if type(erro).__name__ == "DisposedException" or self.processo.poll() is not None:
+                # Ponte UNO perdida: ativa() passa a ser falsa e o pool reconecta.
+                self.desktop = None
+            raise ErroConversao(f"LibreOffice falhou em {self} convertendo '{os.path.basename(origem)}': {erro}")
+
+    @staticmethod
+    def _converter_via_uno(desktop, origem: str, destino: str, resultado: dict):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def propriedades(**valores):
+            return tuple(PropertyValue(Name=nome, Value=valor) for nome, valor in valores.items())
+
+        documento = None
+        try:
+            documento = desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(origem)), "_blank", 0,
+                propriedades(Hidden=True, ReadOnly=True),
+            )
+            if documento is None:
+                raise ErroConversao("formato não reconhecido")
+            filtro = next((f for servico, f in FILTROS_PDF if documento.supportsService(servico)), "writer_pdf_Export")
+            documento.storeToURL(uno.systemPathToFileUrl(os.path.abspath(destino)), propriedades(FilterName=filtro))
+        except Exception as e:
+            resultado["erro"] = e
+        finally:
+            if documento is not None:
+                try:
+                    documento.close(True)
+                except Exception:
+                    pass
+
+    def encerrar(self):
+        self.desktop = None
+        if self.processo is not None and self.processo.poll() is None:
+            self.processo.terminate()
+            try:
+                self.processo.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.processo.kill()
+                self.processo.wait()
+        self.processo = None
+        if self.perfil_dir:
+            shutil.rmtree(self.perfil_dir, ignore_errors=True)
+            self.perfil_dir = None
+
+    def reiniciar(self):
+        self.encerrar()
+        self.iniciar()
+
+
+class InstanciaSimulada:
+    """Substituto do LibreOffice: escreve um PDF mínimo após CONVERSOR_SIMULADO_ATRASO segundos."""
+
+    def __init__(self, indice: int, timeout: int = CONVERSOR_TIMEOUT):
+        self.indice = indice
+        self.timeout = timeout
+        self.reinicios = 0
+        self._ativa = False
+
+    def __repr__(self):
+        return f"Simulado#{self.indice}"
+
+    def iniciar(self):
+        self._ativa = True
+
+    def ativa(self) -> bool:
+        return self._ativa
+
+    def converter(self, origem: str, destino: str):
+        if CONVERSOR_SIMULADO_ATRASO > self.timeout:
+            time.sleep(self.timeout)
+            raise TimeoutConversao(f"{self} excedeu {self.timeout}s convertendo '{os.path.basename(origem)}'")
+        if CONVERSOR_SIMULADO_ATRASO:
+            time.sleep(CONVERSOR_SIMULADO_ATRASO)
+        with open(destino, "wb") as f:
+            f.write(PDF_SIMULADO)
+
+    def encerrar(self):
+        self._ativa = False
+
+    def reiniciar(self):
+        self.reinicios += 1
+        self.encerrar()
+        self.iniciar()
+
+
+BACKENDS = {
+    "unoconv": InstanciaLibreOffice,
+    "simulado": InstanciaSimulada,
+}
+
+
+class PoolConversao:
+    """Distribui conversões entre instâncias aquecidas através de uma fila de tarefas.
+
+    Cada instância tem uma thread dedicada que retira documentos da fila,
+    verifica se o processo ainda está vivo e o reinicia após travamento ou
+    queda, de modo que um documento problemático não derruba o pool.
+    """
+
+    def __init__(self, fabrica_instancia, tamanho: int, timeout: int):
+        self.instancias = [fabrica_instancia(indice, timeout) for indice in range(tamanho)]
+        self._fila = queue.Queue()
+        self._threads = []
+        # Protege _encerrado e a fila: nenhuma tarefa entra depois das sentinelas de encerrar().
+        self._lock = threading.Lock()
+        self._encerrado = False
+
+    def iniciar(self):
+        for instancia in self.instancias:
+            try:
+                instancia.iniciar()
+            except ErroConversao as e:
+                # A thread da instância tenta novamente antes da próxima conversão.
+                print(f"    -> Conversor: ERRO ao iniciar {instancia}: {e}")
+            thread = threading.Thread(target=self._executar, args=(instancia,), name=f"conversor-{instancia.indice}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _executar(self, instancia):
+        while True:
+            tarefa = self._fila.get()
+            if tarefa is None:
+                break
+            origem, destino, future = tarefa
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if not instancia.ativa():
+                    print(f"    -> Conversor: {instancia} não está ativa. Reiniciando...")
+                    instancia.reiniciar()
+                instancia.converter(origem, destino)
+                future.set_result(destino)
+            except TimeoutConversao as e:
+                print(f"    -> Conversor: {e}. Reiniciando {instancia}...")
+                self._reiniciar_com_seguranca(instancia)
+                future.set_exception(e)
+            except Exception as e:
+                if not instancia.ativa():
+                    self._reiniciar_com_seguranca(instancia)
+                future.set_exception(e if isinstance(e, ErroConversao) else ErroConversao(str(e)))
+        instancia.encerrar()
+
+    def _reiniciar_com_seguranca(self, instancia):
+        try:
+            instancia.reiniciar()
+        except ErroConversao as e:
+            print(f"    -> Conversor: ERRO ao reiniciar {instancia}: {e}")
+
+    def converter(self, origem: str, destino: str) -> str:
+        future = Future()
+        with self._lock:
+            if self._encerrado:
+                raise ErroConversao("Pool de conversão encerrado.")
+            self._fila.put((origem, destino, future))
+        return future.result()
+
+    def encerrar(self):
+        with self._lock:
+            if self._encerrado:
+                return
+            self._encerrado = True
+            for _ in self._threads:
+                self._fila.put(None)
+        for thread in self._threads:
+            thread.join(timeout=15)
+        # Tarefas que nenhuma thread chegou a retirar (uma instância travada além
+        # do timeout) falham em vez de deixar quem chamou converter() esperando.
+        while True:
+            try:
+                tarefa = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if tarefa is not None and tarefa[2].set_running_or_notify_cancel():
+                tarefa[2].set_exception(ErroConversao("Pool de conversão encerrado."))
+
+
+class CacheConversao:
+    """Cache em disco de PDFs convertidos, com despejo LRU acima de CACHE_CONVERSAO_MAX_BYTES.
+
+    Cada entrada é o arquivo `<checksum da origem>-<hash da versão>.pdf`,
+    acompanhado de um `.json` com o SHA-256 e o tamanho do PDF (calculados na
+    cópia para o cache), para que um acerto não precise ler o PDF de novo; o
+    mtime do PDF marca o último uso. O diretório pode ser compartilhado entre
+    processos: as gravações são atômicas (arquivo temporário + rename) e o
+    total em bytes é recalculado a partir do disco a cada despejo.
+    """
+
+    def __init__(self, diretorio: str, max_bytes: int = CACHE_CONVERSAO_MAX_BYTES, ativo: bool = CACHE_CONVERSAO_ATIVO):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.ativo = ativo
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = None
+        self._lock = threading.Lock()
+
+    def chave(self, checksum_origem: str) -> str:
+        versao = hashlib.sha256(versao_conversor().encode("utf-8")).hexdigest()[:12]
+        return f"{checksum_origem}-{versao}"
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, f"{chave}.pdf")
+
+    def _caminho_metadados(self, caminho_pdf: str) -> str:
+        return caminho_pdf[:-len(".pdf")] + ".json"
+
+    def obter(self, chave: str, destino: str):
+        """Copia o PDF em cache para `destino` e retorna {"checksum", "tamanho"} do PDF, ou None em caso de miss.
+
+        O checksum é None em entradas gravadas sem os metadados.
+        """
+        if not self.ativo:
+            return None
+        caminho = self._caminho(chave)
+        try:
+            os.utime(caminho)
+            if os.path.lexists(destino):
+                os.remove(destino)
+            try:
+                os.link(caminho, destino)
+            except OSError:
+                shutil.copyfile(caminho, destino)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        try:
+            with open(self._caminho_metadados(caminho)) as f:
+                metadados = json.load(f)
+            return {"checksum": metadados["checksum"], "tamanho": metadados["tamanho"]}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {"checksum": None, "tamanho": os.path.getsize(destino)}
+
+    def guardar(self, chave: str, origem: str):
+        """Copia o PDF para o cache e retorna seu SHA-256, calculado na cópia (None se não guardou)."""
+        if not self.ativo or os.path.exists(self._caminho(chave)):
+            return None
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+            sha256_hash = hashlib.sha256()
+            tamanho = 0
+            with os.fdopen(descritor, "wb") as destino, open(origem, "rb") as f:
+                for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                    sha256_hash.update(bloco)
+                    destino.write(bloco)
+                    tamanho += len(bloco)
+            checksum = sha256_hash.hexdigest()
+            # Os metadados entram antes do PDF: um PDF visível no cache já tem o seu .json.
+            metadados = {"checksum": checksum, "tamanho": tamanho}
+            with open(f"{temporario}.json", "w") as f:
+                json.dump(metadados, f)
+            os.replace(f"{temporario}.json", self._caminho_metadados(self._caminho(chave)))
+            os.replace(temporario, self._caminho(chave))
+        except OSError as e:
+            print(f"    -> Conversor: AVISO: não foi possível guardar a conversão no cache: {e}")
+            return None
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._medir()
+            else:
+                self._bytes += tamanho
+            if self._bytes > self.max_bytes:
+                self._despejar()
+        return checksum
+
+    def _entradas(self) -> list:
+        entradas = []
+        with os.scandir(self.diretorio) as itens:
+            for item in itens:
+                if item.name.endswith(".pdf"):
+                    try:
+                        info = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    entradas.append((info.st_mtime, info.st_size, item.path))
+        return entradas
+
+    def _medir(self) -> int:
+        return sum(tamanho for _, tamanho, _ in self._entradas())
+
+    def _despejar(self):
+        entradas = sorted(self._entradas())
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, caminho in entradas:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(caminho)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            try:
+                os.remove(self._caminho_metadados(caminho))
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+        self._bytes = total
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            if self._bytes is None and os.path.isdir(self.diretorio):
+                self._bytes = self._medir()
+            consultas = self.hits + self.misses
+            return {
+                "ativo": self.ativo,
+                "versao_conversor": versao_conversor(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "taxa_acerto": self.hits / consultas if consultas else 0.0,
+                "bytes": self._bytes or 0,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obter_pool() -> PoolConversao:
+    """Retorna o pool do processo, iniciando as instâncias no primeiro uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if CONVERSOR_BACKEND not in BACKENDS:
+                raise ErroConversao(f"CONVERSOR_BACKEND desconhecido: '{CONVERSOR_BACKEND}'. Opções: {', '.join(BACKENDS)}")
+            print(f"--- Iniciando pool de conversão: {CONVERSOR_INSTANCIAS} instância(s) '{CONVERSOR_BACKEND}', timeout {CONVERSOR_TIMEOUT}s ---")
+            _pool = PoolConversao(BACKENDS[CONVERSOR_BACKEND], CONVERSOR_INSTANCIAS, CONVERSOR_TIMEOUT)
+            _pool.iniciar()
+        return _pool
+
+
+def encerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.encerrar()
+            _pool = None
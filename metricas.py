@@ -0,0 +1,102 @@
+"""Métricas do serviço no formato Prometheus (GET /metrics).
+
+Contadores e histogramas são agregados em memória pelo prometheus_client; os
+valores que dependem de estado externo (profundidade da fila no Redis, uso
+do pool de conexões do banco, estatísticas dos caches) são lidos apenas no
+momento da coleta, por coletores registrados com `registrar_coletor`.
+
+Com vários processos (`uvicorn --workers N` e os processos de
+`python -m worker`), defina PROMETHEUS_MULTIPROC_DIR com um diretório
+compartilhado e vazio na partida: cada processo grava seus contadores ali e
+a coleta soma os valores de todos eles.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+BUCKETS_ESTAGIO = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BUCKETS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+DURACAO_ESTAGIO = Histogram(
+    "gestao_ingest_estagio_segundos", "Duração de cada etapa da ingestão (checksum, upload, conversão, registro, transferência).",
+    ["estagio"], buckets=BUCKETS_ESTAGIO,
+)
+BYTES_PROCESSADOS = Counter(
+    "gestao_ingest_bytes_total", "Bytes processados por etapa da ingestão.", ["estagio"],
+)
+TRANSFERENCIAS = Counter(
+    "gestao_ingest_transferencias_total", "Transferências processadas, por resultado.", ["resultado"],
+)
+ARQUIVOS = Counter(
+    "gestao_ingest_arquivos_total", "Arquivos enviados ao storage ou deduplicados, por bucket.", ["bucket", "resultado"],
+)
+CONVERSOES = Counter(
+    "gestao_conversoes_total", "Normalizações para PDF, por resultado (sucesso, cache, falha, timeout, ignorada).", ["resultado"],
+)
+DURACAO_REQUISICAO = Histogram(
+    "gestao_http_requisicao_segundos", "Latência das requisições HTTP por rota.",
+    ["metodo", "rota", "status"], buckets=BUCKETS_HTTP,
+)
+
+
+@contextmanager
+def medir(estagio: str):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        DURACAO_ESTAGIO.labels(estagio).observe(time.perf_counter() - inicio)
+
+
+class ColetorDeEstado:
+    """Adapta uma função a um coletor Prometheus de gauges.
+
+    A função retorna {nome: (descricao, nomes_dos_rotulos, {tupla_de_rotulos: valor})}.
+    """
+
+    def __init__(self, funcao):
+        self.funcao = funcao
+
+    def describe(self):
+        # Sem describe, o registro chamaria collect (Redis, banco) já na importação.
+        return []
+
+    def collect(self):
+        try:
+            metricas = self.funcao()
+        except Exception as e:
+            print(f"AVISO: Falha ao coletar métricas de estado: {e}")
+            return
+        for nome, (descricao, rotulos, valores) in metricas.items():
+            familia = GaugeMetricFamily(nome, descricao, labels=rotulos)
+            for chave, valor in valores.items():
+                familia.add_metric(list(chave), valor)
+            yield familia
+
+
+_coletores = []
+
+
+def registrar_coletor(funcao):
+    coletor = ColetorDeEstado(funcao)
+    _coletores.append(coletor)
+    REGISTRY.register(coletor)
+
+
+def registro():
+    """Registro a exportar: o do processo ou, em modo multiprocesso, o agregado de todos."""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    agregado = CollectorRegistry()
+    multiprocess.MultiProcessCollector(agregado)
+    for coletor in _coletores:
+        agregado.register(coletor)
+    return agregado
+
+
+def exportar():
+    """Conteúdo e content-type da resposta de /metrics."""
+    return generate_latest(registro()), CONTENT_TYPE_LATEST
@@ -0,0 +1,140 @@
+"""Migrações versionadas do schema no PostgreSQL.
+
+    python -m migracoes    # cria as tabelas e aplica as migrações pendentes
+
+`create_all` só cria as tabelas que ainda não existem; colunas e índices
+novos em tabelas existentes entram aqui como uma migração numerada. A tabela
+tp_migracoes guarda as versões já aplicadas, cada migração roda uma única
+vez em sua própria transação, e um advisory lock impede que dois processos
+iniciando ao mesmo tempo apliquem a mesma migração.
+
+As migrações 1 a 4 usam IF NOT EXISTS e podem rodar sobre um banco que já
+tenha essas colunas e índices.
+
+Para alterar o schema, acrescente uma Migracao ao final de MIGRACOES (nunca
+edite uma migração já publicada) e declare a mesma coluna ou índice em
+models.py, para que bancos novos criados por `create_all` fiquem iguais.
+"""
+from typing import List, NamedTuple
+
+from sqlalchemy import text
+
+# Chave do pg_advisory_xact_lock que serializa as migrações entre processos.
+CHAVE_LOCK = 7311001
+
+CRIAR_TABELA_MIGRACOES = """
+CREATE TABLE IF NOT EXISTS tp_migracoes (
+    num_versao INTEGER PRIMARY KEY,
+    dsc_migracao VARCHAR NOT NULL,
+    dhs_aplicacao TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now()
+)
+"""
+
+# Preenche os caminhos materializados das pastas criadas antes dessas colunas.
+PREENCHER_CAMINHOS_PASTAS = """
+WITH RECURSIVE arvore AS (
+    SELECT cod_id, CAST(nom_pasta AS VARCHAR) AS caminho, '/' || cod_id || '/' AS caminho_ids, 0 AS profundidade
+    FROM tp_pastas WHERE cod_pai IS NULL
+    UNION ALL
+    SELECT f.cod_id, a.caminho || '/' || f.nom_pasta, a.caminho_ids || f.cod_id || '/', a.profundidade + 1
+    FROM tp_pastas f JOIN arvore a ON f.cod_pai = a.cod_id
+)
+UPDATE tp_pastas SET dsc_caminho = arvore.caminho, dsc_caminho_ids = arvore.caminho_ids, num_profundidade = arvore.profundidade
+FROM arvore WHERE tp_pastas.cod_id = arvore.cod_id AND tp_pastas.dsc_caminho IS NULL
+"""
+
+
+class Migracao(NamedTuple):
+    versao: int
+    descricao: str
+    comandos: List[str]
+
+
+MIGRACOES = [
+    Migracao(1, "Tamanho e data de modificação dos arquivos", [
+        "ALTER TABLE tp_arquivos_originais ADD COLUMN IF NOT EXISTS num_tamanho_bytes BIGINT",
+        "ALTER TABLE tp_arquivos_originais ADD COLUMN IF NOT EXISTS dhs_modificacao TIMESTAMP WITHOUT TIME ZONE",
+        "ALTER TABLE tp_arquivos_preservacao ADD COLUMN IF NOT EXISTS num_tamanho_bytes BIGINT",
+        "ALTER TABLE tp_arquivos_preservacao ADD COLUMN IF NOT EXISTS dhs_modificacao TIMESTAMP WITHOUT TIME ZONE",
+    ]),
+    Migracao(2, "Caminhos materializados das pastas", [
+        "ALTER TABLE tp_pastas ADD COLUMN IF NOT EXISTS dsc_caminho VARCHAR",
+        "ALTER TABLE tp_pastas ADD COLUMN IF NOT EXISTS dsc_caminho_ids VARCHAR",
+        "ALTER TABLE tp_pastas ADD COLUMN IF NOT EXISTS num_profundidade INTEGER",
+        "CREATE INDEX IF NOT EXISTS ix_tp_pastas_caminho_ids ON tp_pastas (dsc_caminho_ids text_pattern_ops)",
+        PREENCHER_CAMINHOS_PASTAS,
+    ]),
+    Migracao(3, "Índices de deduplicação por checksum e caminho no storage", [
+        "CREATE INDEX IF NOT EXISTS ix_tp_arquivos_originais_checksum ON tp_arquivos_originais (num_checksum)",
+        "CREATE INDEX IF NOT EXISTS ix_tp_arquivos_originais_caminho ON tp_arquivos_originais (dsc_caminho_minio text_pattern_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_tp_arquivos_preservacao_checksum ON tp_arquivos_preservacao (num_checksum)",
+        "CREATE INDEX IF NOT EXISTS ix_tp_arquivos_preservacao_caminho ON tp_arquivos_preservacao (dsc_caminho_minio text_pattern_ops)",
+    ]),
+    # Trigramas atendem LIKE '%termo%' pelo índice; os textos antigos são preenchidos por backfill_busca.py.
+    Migracao(4, "Textos de busca com índices de trigramas", [
+        "ALTER TABLE tp_aips ADD COLUMN IF NOT EXISTS dsc_busca VARCHAR",
+        "ALTER TABLE tp_arquivos_originais ADD COLUMN IF NOT EXISTS dsc_nome_busca VARCHAR",
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_tp_aips_busca ON tp_aips USING gin (dsc_busca gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_tp_arquivos_originais_nome_busca ON tp_arquivos_originais USING gin (dsc_nome_busca gin_trgm_ops)",
+    ]),
+    Migracao(5, "Índices das consultas por AIP, pasta e data de criação", [
+        "CREATE INDEX IF NOT EXISTS ix_tp_arquivos_originais_cod_aip ON tp_arquivos_originais (cod_aip)",
+        "CREATE INDEX IF NOT EXISTS ix_tp_arquivos_preservacao_cod_aip ON tp_arquivos_preservacao (cod_aip)",
+        "CREATE INDEX IF NOT EXISTS ix_tp_aips_pasta_criacao ON tp_aips (cod_pasta, dhs_creation, cod_id)",
+        "CREATE INDEX IF NOT EXISTS ix_tp_aips_ativos_criacao ON tp_aips (dhs_creation, cod_id) WHERE dhs_deleted IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_tp_pastas_cod_pai ON tp_pastas (cod_pai)",
+        "ANALYZE tp_aips",
+        "ANALYZE tp_pastas",
+        "ANALYZE tp_arquivos_originais",
+        "ANALYZE tp_arquivos_preservacao",
+    ]),
+    # A deduplicação só calcula o checksum antes do envio de arquivos com o tamanho de um objeto existente.
+    Migracao(6, "Índices por tamanho dos arquivos", [
+        "CREATE INDEX IF NOT EXISTS ix_tp_arquivos_originais_tamanho ON tp_arquivos_originais (num_tamanho_bytes)",
+        "CREATE INDEX IF NOT EXISTS ix_tp_arquivos_preservacao_tamanho ON tp_arquivos_preservacao (num_tamanho_bytes)",
+    ]),
+]
+
+
+def versoes_aplicadas(conn) -> set:
+    return set(conn.execute(text("SELECT num_versao FROM tp_migracoes")).scalars())
+
+
+def aplicar(engine) -> List[int]:
+    """Aplica as migrações pendentes, em ordem, e retorna as versões aplicadas agora.
+
+    Nos demais bancos (SQLite nos testes e no benchmark) o schema vem inteiro
+    de `create_all` e não há o que migrar.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": CHAVE_LOCK})
+        conn.execute(text(CRIAR_TABELA_MIGRACOES))
+        ja_aplicadas = versoes_aplicadas(conn)
+    pendentes = [migracao for migracao in MIGRACOES if migracao.versao not in ja_aplicadas]
+
+    aplicadas = []
+    for migracao in pendentes:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": CHAVE_LOCK})
+            # Outro processo pode ter aplicado a migração enquanto esperávamos o lock.
+            if migracao.versao in versoes_aplicadas(conn):
+                continue
+            print(f"--- Migração {migracao.versao}: {migracao.descricao} ---")
+            for comando in migracao.comandos:
+                conn.execute(text(comando))
+            conn.execute(
+                text("INSERT INTO tp_migracoes (num_versao, dsc_migracao) VALUES (:versao, :descricao)"),
+                {"versao": migracao.versao, "descricao": migracao.descricao},
+            )
+        aplicadas.append(migracao.versao)
+    return aplicadas
+
+
+if __name__ == "__main__":
+    import main
+
+    main.preparar_schema()
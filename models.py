@@ -1,6 +1,6 @@
 # Em ../gestao-dados/models.py
 
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 import uuid
@@ -12,6 +12,12 @@ class TpPasta(Base):
     cod_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     nom_pasta = Column(String, nullable=False)
     cod_pai = Column(String, ForeignKey("tp_pastas.cod_id"), nullable=True)
+    # Caminho materializado: nomes desde a raiz ("a/b/c", usado como prefixo no
+    # MinIO) e ids desde a raiz ("/id_a/id_b/id_c/", usado para buscar
+    # a subárvore com uma única consulta indexada).
+    dsc_caminho = Column(String, nullable=True)
+    dsc_caminho_ids = Column(String, nullable=True)
+    num_profundidade = Column(Integer, nullable=True)
     
     filhas = relationship("TpPasta", back_populates="pai")
     pai = relationship("TpPasta", back_populates="filhas", remote_side=[cod_id])
@@ -19,6 +25,8 @@ class TpPasta(Base):
 
     __table_args__ = (
         UniqueConstraint('nom_pasta', 'cod_pai', name='uq_pasta_pai_nome'),
+        Index('ix_tp_pastas_caminho_ids', 'dsc_caminho_ids', postgresql_ops={'dsc_caminho_ids': 'text_pattern_ops'}),
+        Index('ix_tp_pastas_cod_pai', 'cod_pai'),
     )
 
 class TpAip(Base):
@@ -27,6 +35,9 @@ class TpAip(Base):
     cod_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     nom_titulo = Column(String, nullable=False)
     nom_ra = Column(String, nullable=True)
+    # Título e RA normalizados por sanitize_title, para a busca (GET /aips/search).
+    # O índice de trigramas (pg_trgm) é criado pela migração 4 (migracoes.py).
+    dsc_busca = Column(String, nullable=True)
     
     dhs_creation = Column(DateTime, default=datetime.utcnow)
     dhs_deleted = Column(DateTime, nullable=True, default=None)
@@ -37,6 +48,14 @@ class TpAip(Base):
     arquivos_originais = relationship("TpArquivoOriginal", back_populates="aip")
     arquivos_preservacao = relationship("TpArquivoPreservacao", back_populates="aip")
 
+    # Listagens por pasta e paginação de GET /aips por (dhs_creation, cod_id);
+    # o índice parcial cobre só os AIPs ativos, que são os listados.
+    __table_args__ = (
+        Index('ix_tp_aips_pasta_criacao', 'cod_pasta', 'dhs_creation', 'cod_id'),
+        Index('ix_tp_aips_ativos_criacao', 'dhs_creation', 'cod_id',
+              postgresql_where=dhs_deleted.is_(None), sqlite_where=dhs_deleted.is_(None)),
+    )
+
 class TpArquivoOriginal(Base):
     __tablename__ = "tp_arquivos_originais"
     cod_original = Column(Integer, primary_key=True, index=True)
@@ -45,9 +64,23 @@ class TpArquivoOriginal(Base):
     dsc_caminho_minio = Column(String, nullable=False)
     num_checksum = Column(String, nullable=False)
     sig_formato = Column(String, nullable=False)
+    num_tamanho_bytes = Column(BigInteger, nullable=True)
+    dhs_modificacao = Column(DateTime, nullable=True)
+    # Nome normalizado por sanitize_title, para a busca; índice de trigramas na migração 4 (migracoes.py).
+    dsc_nome_busca = Column(String, nullable=True)
     
     aip = relationship("TpAip", back_populates="arquivos_originais")
 
+    # Arquivos idênticos compartilham o mesmo objeto no storage: o tamanho
+    # filtra os candidatos, o checksum localiza o objeto existente e o caminho
+    # conta quantas linhas o referenciam.
+    __table_args__ = (
+        Index('ix_tp_arquivos_originais_cod_aip', 'cod_aip'),
+        Index('ix_tp_arquivos_originais_checksum', 'num_checksum'),
+        Index('ix_tp_arquivos_originais_tamanho', 'num_tamanho_bytes'),
+        Index('ix_tp_arquivos_originais_caminho', 'dsc_caminho_minio', postgresql_ops={'dsc_caminho_minio': 'text_pattern_ops'}),
+    )
+
 class TpArquivoPreservacao(Base):
     __tablename__ = "tp_arquivos_preservacao"
     cod_preservacao = Column(Integer, primary_key=True, index=True)
@@ -56,5 +89,14 @@ class TpArquivoPreservacao(Base):
     dsc_caminho_minio = Column(String, nullable=False)
     num_checksum = Column(String, nullable=False)
     sig_formato = Column(String, nullable=False)
+    num_tamanho_bytes = Column(BigInteger, nullable=True)
+    dhs_modificacao = Column(DateTime, nullable=True)
     
-    aip = relationship("TpAip", back_populates="arquivos_preservacao")
\ No newline at end of file
+    aip = relationship("TpAip", back_populates="arquivos_preservacao")
+
+    __table_args__ = (
+        Index('ix_tp_arquivos_preservacao_cod_aip', 'cod_aip'),
+        Index('ix_tp_arquivos_preservacao_checksum', 'num_checksum'),
+        Index('ix_tp_arquivos_preservacao_tamanho', 'num_tamanho_bytes'),
+        Index('ix_tp_arquivos_preservacao_caminho', 'dsc_caminho_minio', postgresql_ops={'dsc_caminho_minio': 'text_pattern_ops'}),
+    )
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""Execução em estágios da pipeline de arquivos de um SIP.
+
+Cada estágio tem suas próprias threads e recebe os itens do estágio anterior
+por uma fila limitada, de modo que o disco, a rede e o conversor trabalham ao
+mesmo tempo em arquivos diferentes: enquanto o arquivo N é convertido, o
+N+1 já está sendo enviado. A fila limitada impede que um estágio rápido
+acumule trabalho demais à frente de um lento.
+
+Na primeira exceção a pipeline é cancelada: os estágios passam a apenas
+esvaziar suas filas e a exceção é relançada por `executar`.
+"""
+import queue
+import threading
+
+FIM = object()
+
+
+class PipelineEmEstagios:
+    """Processa itens por uma sequência de estágios (nome, função, threads).
+
+    A função de cada estágio recebe o item e retorna True para encaminhá-lo
+    ao próximo estágio, False para encerrá-lo ali, ou uma lista de itens a
+    encaminhar no lugar dele (por exemplo, os arquivos de um lote). O item é
+    um objeto mutável que acumula os resultados dos estágios.
+    """
+
+    def __init__(self, estagios: list, capacidade_fila: int, nome: str = "pipeline"):
+        self.estagios = estagios
+        self.capacidade_fila = capacidade_fila
+        self.nome = nome
+        self.cancelado = threading.Event()
+        self._erro = None
+        self._lock = threading.Lock()
+
+    def executar(self, itens: list):
+        filas = [queue.Queue(maxsize=self.capacidade_fila) for _ in self.estagios]
+        ativos = [threads for _, _, threads in self.estagios]
+        threads = []
+        for indice, (nome, funcao, quantidade) in enumerate(self.estagios):
+            for numero in range(quantidade):
+                thread = threading.Thread(
+                    target=self._trabalhar, args=(indice, funcao, filas, ativos),
+                    name=f"{self.nome}-{nome}-{numero}", daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        for item in itens:
+            if self.cancelado.is_set():
+                break
+            filas[0].put(item)
+        for _ in range(ativos[0]):
+            filas[0].put(FIM)
+
+        for thread in threads:
+            thread.join()
+        if self._erro is not None:
+            raise self._erro
+
+    def _trabalhar(self, indice: int, funcao, filas: list, ativos: list):
+        while True:
+            item = filas[indice].get()
+            if item is FIM:
+                break
+            if self.cancelado.is_set():
+                continue
+            try:
+                continuar = funcao(item)
+            except BaseException as e:
+                self._cancelar(e)
+                continue
+            if indice + 1 == len(filas) or not continuar:
+                continue
+            for proximo in (continuar if isinstance(continuar, list) else [item]):
+                filas[indice + 1].put(proximo)
+
+        # A última thread do estágio avisa o próximo que não há mais itens.
+        with self._lock:
+            ativos[indice] -= 1
+            ultima = ativos[indice] == 0
+        if ultima and indice + 1 < len(filas):
+            for _ in range(ativos[indice + 1]):
+                filas[indice + 1].put(FIM)
+
+    def _cancelar(self, erro: BaseException):
+        with self._lock:
+            if self._erro is None:
+                self._erro = erro
+        self.cancelado.set()
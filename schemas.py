@@ -7,6 +7,8 @@ class ArquivoBase(BaseModel):
     caminho_minio: str
     checksum: str
     formato: str
+    tamanho_bytes: Optional[int] = None
+    ultima_modificacao: Optional[datetime] = None
 
 class RenamePayload(BaseModel):
     novo_titulo: str
@@ -21,9 +23,22 @@ class AIPCreate(BaseModel):
     transfer_id: str
     titulo: str
     cod_pasta: Optional[str] = None 
+    ra: Optional[str] = None
     originais: List[ArquivoOriginalCreate]
     preservados: List[ArquivoPreservacaoCreate] = [] 
 
+class ResultadoItemLote(BaseModel):
+    indice: int
+    transfer_id: Optional[str] = None
+    status: str
+    detalhe: Optional[str] = None
+
+class RegistroLoteResponse(BaseModel):
+    criados: int
+    conflitos: int
+    falhas: int
+    itens: List[ResultadoItemLote]
+
 class LocationResponse(BaseModel):
     bucket: str
     path: str
@@ -51,6 +66,15 @@ class AipDetailsResponse(BaseModel):
     data_criacao: datetime
     cod_pasta: Optional[str] = None 
     arquivos: List[FileDetails]
+
+class ResultadoBuscaAip(BaseModel):
+    transfer_id: str
+    titulo: str
+    ra: Optional[str] = None
+    cod_pasta: Optional[str] = None
+    data_criacao: datetime
+    relevancia: int
+    arquivos_encontrados: List[str] = []
     
 class PastaBase(BaseModel):
     nom_pasta: str
@@ -96,3 +120,15 @@ class AipInFolder(BaseModel):
 class PastaDetails(Pasta): 
     aips: List[AipInFolder] = []
     filhas: List[PastaResumida] = [] 
+
+
+class PastaArvore(BaseModel):
+    cod_id: str
+    nom_pasta: str
+    cod_pai: Optional[str] = None
+    aips: int
+    total_aips: int
+    total_arquivos: int
+    total_bytes: int
+    possui_filhas: bool
+    filhas: List["PastaArvore"] = []
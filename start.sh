@@ -1,9 +1,45 @@
+#!/bin/sh
+# As instâncias do LibreOffice são iniciadas e supervisionadas pelo pool de
+# conversão de cada processo de ingestão (conversor.py), uma por porta a
+# partir de CONVERSOR_PORTA_BASE.
+#
+# Uso: ./start.sh [todos|api|worker]
+#   api    - só a API: uvicorn com API_WORKERS processos, sem consumidor Redis
+#   worker - só a ingestão: python -m worker (WORKER_PROCESSOS processos)
+#   todos  - os dois no mesmo container (padrão)
+set -e
 
+SERVICO="${1:-todos}"
 
-echo "Iniciando listener do unoconv em segundo plano..."
-unoconv --listener &
+# Contadores de todos os processos do container somados em /metrics
+# (metricas.py). Cada container usa um subdiretório próprio, então a limpeza
+# abaixo não apaga as métricas de outro container mesmo que a base seja um
+# volume compartilhado.
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/metricas_prometheus}/$(hostname)"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 
-sleep 5
+echo "Aplicando migrações do banco..."
+python -m migracoes
 
-echo "Iniciando servidor da API FastAPI e consumidor Redis..."
-uvicorn main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+case "$SERVICO" in
+  api)
+    echo "Iniciando a API FastAPI com ${API_WORKERS:-2} processo(s)..."
+    exec uvicorn main:app --host 0.0.0.0 --port 8000 --workers "${API_WORKERS:-2}"
+    ;;
+  worker)
+    # Sem a API no container, as métricas da ingestão só são vistas por esta porta.
+    export WORKER_METRICAS_PORTA="${WORKER_METRICAS_PORTA:-8001}"
+    echo "Iniciando o worker de ingestão (métricas em :${WORKER_METRICAS_PORTA}/metrics)..."
+    exec python -m worker
+    ;;
+  todos)
+    echo "Iniciando o worker de ingestão e a API FastAPI com ${API_WORKERS:-2} processo(s)..."
+    python -m worker &
+    exec uvicorn main:app --host 0.0.0.0 --port 8000 --workers "${API_WORKERS:-2}"
+    ;;
+  *)
+    echo "Uso: $0 [todos|api|worker]" >&2
+    exit 1
+    ;;
+esac
@@ -0,0 +1,451 @@
+"""Envio de arquivos para o microsserviço de storage.
+
+O corpo multipart é montado sob demanda a partir do disco, em blocos de
+UPLOAD_TAMANHO_BLOCO bytes: cada bloco lido alimenta ao mesmo tempo o
+SHA-256 do arquivo e o corpo da requisição. Assim cada arquivo é lido uma
+única vez e a memória usada não depende do tamanho do arquivo.
+
+As requisições HTTP do serviço (storage e Mapoteca) passam por uma sessão
+compartilhada com pool de conexões keep-alive e por `requisitar`, que repete
+falhas de conexão e respostas 429/5xx com backoff exponencial com jitter.
+Arquivos pequenos de um mesmo SIP podem ser enviados juntos em um único
+multipart (campo `files` repetido) com `enviar_lote_para_storage_com_checksum`.
+Os endpoints assíncronos da API consultam metadados por um httpx.AsyncClient.
+
+Com UPLOAD_PARTES_LIMIAR_BYTES definido, arquivos a partir desse tamanho
+(digitalizações e CAD de vários GB) vão em partes de UPLOAD_PARTE_TAMANHO bytes, até
+UPLOAD_PARTES_PARALELAS em voo, cada uma repetida isoladamente em caso de
+falha. O identificador do upload fica em um arquivo de estado em
+UPLOAD_ESTADO_DIR; se a transferência for reprocessada, o envio retoma do
+ponto em que parou, mandando só as partes que o storage ainda não confirmou.
+Se o storage não oferece o upload em partes (404/405 na abertura), o
+arquivo volta para o multipart único.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+MINIO_SERVICE_API_URL = os.environ.get("MINIO_SERVICE_API_URL", "http://storage_app:3003")
+UPLOAD_TAMANHO_BLOCO = int(os.environ.get("UPLOAD_TAMANHO_BLOCO", 1024 * 1024))
+UPLOAD_TIMEOUT = int(os.environ.get("UPLOAD_TIMEOUT", 30))
+METADATA_TIMEOUT = int(os.environ.get("METADATA_TIMEOUT", 10))
+HTTP_POOL_HOSTS = int(os.environ.get("HTTP_POOL_HOSTS", 4))
+HTTP_POOL_CONEXOES = int(os.environ.get("HTTP_POOL_CONEXOES", 32))
+HTTP_TENTATIVAS = int(os.environ.get("HTTP_TENTATIVAS", 3))
+HTTP_BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", 0.5))
+HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", 10))
+HTTP_STATUS_REPETIR = {429, 500, 502, 503, 504}
+# Arquivos de até UPLOAD_LOTE_ARQUIVO_MAX_BYTES são agrupados em lotes de no
+# máximo UPLOAD_LOTE_MAX_ARQUIVOS arquivos e UPLOAD_LOTE_MAX_BYTES bytes.
+UPLOAD_LOTE_ARQUIVO_MAX_BYTES = int(os.environ.get("UPLOAD_LOTE_ARQUIVO_MAX_BYTES", 256 * 1024))
+UPLOAD_LOTE_MAX_ARQUIVOS = int(os.environ.get("UPLOAD_LOTE_MAX_ARQUIVOS", 100))
+UPLOAD_LOTE_MAX_BYTES = int(os.environ.get("UPLOAD_LOTE_MAX_BYTES", 8 * 1024 * 1024))
+# Upload em partes: arquivos a partir do limiar vão em partes retomáveis (0 desliga).
+UPLOAD_PARTES_LIMIAR_BYTES = int(os.environ.get("UPLOAD_PARTES_LIMIAR_BYTES", 0))
+UPLOAD_PARTE_TAMANHO = int(os.environ.get("UPLOAD_PARTE_TAMANHO", 8 * 1024 * 1024))
+UPLOAD_PARTES_PARALELAS = int(os.environ.get("UPLOAD_PARTES_PARALELAS", 4))
+UPLOAD_PARTE_TENTATIVAS = int(os.environ.get("UPLOAD_PARTE_TENTATIVAS", 5))
+UPLOAD_ESTADO_DIR = os.environ.get("UPLOAD_ESTADO_DIR", os.path.join(tempfile.gettempdir(), "uploads_em_partes"))
+METADATA_CONCORRENCIA = int(os.environ.get("METADATA_CONCORRENCIA", 16))
+
+_sessao = None
+_cliente_async = None
+_partes_indisponivel = False
+_sessao_lock = threading.Lock()
+
+
+def obter_sessao() -> requests.Session:
+    """Sessão HTTP do processo, com pool de HTTP_POOL_CONEXOES conexões por host."""
+    global _sessao
+    with _sessao_lock:
+        if _sessao is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_CONEXOES, max_retries=0)
+            sessao.mount("http://", adaptador)
+            sessao.mount("https://", adaptador)
+            _sessao = sessao
+        return _sessao
+
+
+def requisitar(metodo: str, url: str, tentativas: int = HTTP_TENTATIVAS, **kwargs) -> requests.Response:
+    """Executa a requisição pela sessão compartilhada, repetindo falhas transitórias.
+
+    Falhas de conexão, timeouts e status em HTTP_STATUS_REPETIR são repetidos
+    até `tentativas` vezes. Retorna a resposta já validada com
+    raise_for_status; a última falha é lançada como RequestException. Um
+    corpo passado em `data` precisa poder ser iterado de novo a cada tentativa.
+    """
+    for tentativa in range(1, tentativas + 1):
+        try:
+            response = obter_sessao().request(metodo, url, **kwargs)
+            if response.status_code not in HTTP_STATUS_REPETIR or tentativa == tentativas:
+                response.raise_for_status()
+                return response
+            motivo = f"status {response.status_code}"
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if tentativa == tentativas:
+                raise
+            motivo = str(e)
+        atraso = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** (tentativa - 1)) * random.uniform(0.5, 1.0)
+        print(f"        -> AVISO: {metodo} {url} falhou ({motivo}). Tentativa {tentativa + 1}/{tentativas} em {atraso:.1f}s...")
+        time.sleep(atraso)
+
+
+def _parametro_cabecalho(nome, valor):
+    # Mesmo escape do urllib3 (estilo HTML5) para nomes de arquivo em Content-Disposition.
+    valor = valor.replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+    return f'{nome}="{valor}"'
+
+
+class CorpoMultipartComHash:
+    """Corpo multipart/form-data que lê os arquivos em streaming e calcula seus checksums.
+
+    `campos` são os campos de texto do formulário e `arquivos` uma lista de
+    tuplas (nome_do_campo, caminho). Após o corpo ser consumido por completo,
+    `checksums` contém o SHA-256 (hex) de cada arquivo, na mesma ordem.
+    """
+
+    def __init__(self, campos: dict, arquivos: list, tamanho_bloco: int = UPLOAD_TAMANHO_BLOCO):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.tamanho_bloco = tamanho_bloco
+        self.arquivos = arquivos
+        self.checksums = [None] * len(arquivos)
+
+        self._partes = []
+        for nome, valor in campos.items():
+            self._partes.append(
+                f'--{self.boundary}\r\nContent-Disposition: form-data; {_parametro_cabecalho("name", nome)}\r\n\r\n{valor}\r\n'.encode("utf-8")
+            )
+        for indice, (campo, caminho) in enumerate(arquivos):
+            filename = os.path.basename(caminho)
+            self._partes.append(
+                (f'--{self.boundary}\r\nContent-Disposition: form-data; {_parametro_cabecalho("name", campo)}; {_parametro_cabecalho("filename", filename)}\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode("utf-8")
+            )
+            self._partes.append(indice)
+            self._partes.append(b"\r\n")
+        self._partes.append(f"--{self.boundary}--\r\n".encode("utf-8"))
+
+        self._tamanho = sum(
+            os.path.getsize(arquivos[parte][1]) if isinstance(parte, int) else len(parte)
+            for parte in self._partes
+        )
+        self.bytes_enviados = 0
+
+    def __len__(self):
+        return self._tamanho
+
+    def __iter__(self):
+        # Cada iteração recomeça do início, o que permite reenviar o corpo.
+        self.bytes_enviados = 0
+        for parte in self._partes:
+            if not isinstance(parte, int):
+                self.bytes_enviados += len(parte)
+                yield parte
+                continue
+            sha256_hash = hashlib.sha256()
+            with open(self.arquivos[parte][1], "rb") as f:
+                for bloco in iter(lambda: f.read(self.tamanho_bloco), b""):
+                    sha256_hash.update(bloco)
+                    self.bytes_enviados += len(bloco)
+                    yield bloco
+            self.checksums[parte] = sha256_hash.hexdigest()
+
+    def completo(self) -> bool:
+        """Indica se o corpo foi enviado inteiro, com o tamanho anunciado no Content-Length."""
+        return self.bytes_enviados == self._tamanho and None not in self.checksums
+
+
+def agrupar_para_envio(tamanhos: list) -> list:
+    """Agrupa arquivos (pelos tamanhos, na ordem recebida) em lotes de envio.
+
+    Retorna listas de índices. Arquivos maiores que UPLOAD_LOTE_ARQUIVO_MAX_BYTES
+    ficam sozinhos; os menores são reunidos respeitando UPLOAD_LOTE_MAX_ARQUIVOS
+    e UPLOAD_LOTE_MAX_BYTES.
+    """
+    lotes, atual, bytes_atual = [], [], 0
+    for indice, tamanho in enumerate(tamanhos):
+        if tamanho > UPLOAD_LOTE_ARQUIVO_MAX_BYTES:
+            lotes.append([indice])
+            continue
+        if atual and (len(atual) >= UPLOAD_LOTE_MAX_ARQUIVOS or bytes_atual + tamanho > UPLOAD_LOTE_MAX_BYTES):
+            lotes.append(atual)
+            atual, bytes_atual = [], 0
+        atual.append(indice)
+        bytes_atual += tamanho
+    if atual:
+        lotes.append(atual)
+    return lotes
+
+
+def _caminho_estado(file_path, bucket, key_prefix, info) -> str:
+    """Arquivo de estado do upload em partes; muda se o arquivo ou o tamanho das partes mudar."""
+    chave = f"{bucket}|{key_prefix}|{os.path.abspath(file_path)}|{info.st_size}|{info.st_mtime_ns}|{UPLOAD_PARTE_TAMANHO}"
+    return os.path.join(UPLOAD_ESTADO_DIR, hashlib.sha256(chave.encode("utf-8")).hexdigest() + ".json")
+
+
+def _ler_estado(caminho):
+    try:
+        with open(caminho) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_estado(caminho, estado: dict):
+    os.makedirs(UPLOAD_ESTADO_DIR, exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w") as f:
+        json.dump(estado, f)
+    os.replace(temporario, caminho)
+
+
+def _remover_estado(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+
+def _partes_confirmadas(upload_id):
+    """Partes já recebidas pelo storage ({número: etag}), ou None se o upload não existe mais."""
+    try:
+        response = requisitar("GET", f"{MINIO_SERVICE_API_URL}/storage/multipart/{upload_id}", timeout=METADATA_TIMEOUT)
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return None
+        raise
+    return {parte["partNumber"]: parte["etag"] for parte in response.json().get("parts", [])}
+
+
+class UploadEmPartesIndisponivel(Exception):
+    """O storage não atende /storage/multipart."""
+
+
+def enviar_em_partes_com_checksum(file_path, bucket, key_prefix):
+    """Envia um arquivo grande em partes retomáveis, lendo-o uma única vez.
+
+    O arquivo é lido em sequência, parte a parte, alimentando o SHA-256; cada
+    parte ainda não confirmada pelo storage é enviada em paralelo, com até
+    UPLOAD_PARTES_PARALELAS em memória ao mesmo tempo. Em caso de falha o
+    arquivo de estado é mantido para a próxima tentativa retomar o upload.
+    Retorna a tupla (resposta_json, checksum_sha256), ou (None, None) em caso
+    de falha. Lança UploadEmPartesIndisponivel se o storage não tem os
+    endpoints de upload em partes.
+    """
+    nome = os.path.basename(file_path)
+    caminho_estado = None
+    try:
+        info = os.stat(file_path)
+        caminho_estado = _caminho_estado(file_path, bucket, key_prefix, info)
+        total_partes = max(1, -(-info.st_size // UPLOAD_PARTE_TAMANHO))
+
+        estado = _ler_estado(caminho_estado)
+        confirmadas = _partes_confirmadas(estado["uploadId"]) if estado else None
+        if confirmadas is None:
+            try:
+                response = requisitar("POST", f"{MINIO_SERVICE_API_URL}/storage/multipart", json={
+                    "bucket": bucket, "keyPrefix": key_prefix, "fileName": nome,
+                    "size": info.st_size, "partSize": UPLOAD_PARTE_TAMANHO,
+                }, timeout=UPLOAD_TIMEOUT)
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code in (404, 405):
+                    raise UploadEmPartesIndisponivel(f"status {e.response.status_code}") from e
+                raise
+            estado = {"uploadId": response.json()["uploadId"], "bucket": bucket, "keyPrefix": key_prefix, "arquivo": file_path}
+            _gravar_estado(caminho_estado, estado)
+            confirmadas = {}
+            print(f"        -> Enviando '{nome}' ({info.st_size} bytes) em {total_partes} partes para o bucket '{bucket}' com prefixo '{key_prefix}'...")
+        else:
+            print(f"        -> Retomando o envio de '{nome}': {len(confirmadas)}/{total_partes} partes já confirmadas pelo storage.")
+        url_upload = f"{MINIO_SERVICE_API_URL}/storage/multipart/{estado['uploadId']}"
+
+        etags = dict(confirmadas)
+        vagas = threading.BoundedSemaphore(UPLOAD_PARTES_PARALELAS)
+
+        def enviar_parte(numero, dados):
+            try:
+                response = requisitar(
+                    "PUT", f"{url_upload}/parts/{numero}", tentativas=UPLOAD_PARTE_TENTATIVAS, data=dados,
+                    headers={"Content-Type": "application/octet-stream", "X-Checksum-Sha256": hashlib.sha256(dados).hexdigest()},
+                    timeout=UPLOAD_TIMEOUT,
+                )
+                etags[numero] = response.json()["etag"]
+            finally:
+                vagas.release()
+
+        sha256_hash = hashlib.sha256()
+        bytes_lidos = 0
+        futuros = []
+        with open(file_path, "rb") as f, ThreadPoolExecutor(max_workers=UPLOAD_PARTES_PARALELAS) as executor:
+            for numero in range(1, total_partes + 1):
+                dados = f.read(UPLOAD_PARTE_TAMANHO)
+                sha256_hash.update(dados)
+                bytes_lidos += len(dados)
+                if numero in confirmadas:
+                    continue
+                vagas.acquire()
+                # Uma parte que esgotou as tentativas encerra a leitura; as demais em voo terminam.
+                if any(futuro.done() and futuro.exception() for futuro in futuros):
+                    vagas.release()
+                    break
+                futuros.append(executor.submit(enviar_parte, numero, dados))
+        for futuro in futuros:
+            futuro.result()
+
+        if bytes_lidos != info.st_size or os.stat(file_path).st_mtime_ns != info.st_mtime_ns:
+            print(f"        -> ERRO: '{nome}' mudou durante o envio.")
+            _remover_estado(caminho_estado)
+            return None, None
+
+        checksum = sha256_hash.hexdigest()
+        response = requisitar("POST", f"{url_upload}/complete", json={
+            "parts": [{"partNumber": numero, "etag": etags[numero]} for numero in range(1, total_partes + 1)],
+            "checksum": checksum,
+        }, timeout=UPLOAD_TIMEOUT)
+        _remover_estado(caminho_estado)
+        print(f"        -> SUCESSO: '{nome}' enviado para o storage em {total_partes} partes.")
+        return response.json(), checksum
+    except requests.exceptions.RequestException as e:
+        print(f"        -> ERRO: Falha ao enviar '{nome}' em partes para o storage: {e}")
+        if e.response is not None:
+            print(f"        -> Status da Resposta: {e.response.status_code}")
+            print(f"        -> Corpo da Resposta: {e.response.text}")
+            # Upload desconhecido ou recusado: a próxima tentativa recomeça do zero.
+            if e.response.status_code in (404, 409) and caminho_estado:
+                _remover_estado(caminho_estado)
+        return None, None
+    except (KeyError, TypeError, ValueError) as e:
+        print(f"        -> ERRO: Resposta inesperada do storage no envio em partes de '{nome}': {e!r}")
+        if caminho_estado:
+            _remover_estado(caminho_estado)
+        return None, None
+    except OSError as e:
+        print(f"        -> ERRO: Falha ao ler '{nome}' para envio: {e}")
+        return None, None
+
+
+def enviar_lote_para_storage_com_checksum(file_paths, bucket, key_prefix):
+    """Envia vários arquivos em uma única requisição multipart, lendo cada um uma única vez.
+
+    Com UPLOAD_PARTES_LIMIAR_BYTES definido, um arquivo sozinho a partir desse
+    tamanho segue por enviar_em_partes_com_checksum. Retorna a tupla (resposta_json,
+    checksums_sha256) com os checksums na ordem de `file_paths`, ou
+    (None, None) em caso de falha.
+    """
+    global _partes_indisponivel
+    descricao = f"'{os.path.basename(file_paths[0])}'" if len(file_paths) == 1 else f"{len(file_paths)} arquivos"
+    try:
+        if (UPLOAD_PARTES_LIMIAR_BYTES and not _partes_indisponivel and len(file_paths) == 1
+                and os.path.getsize(file_paths[0]) >= UPLOAD_PARTES_LIMIAR_BYTES):
+            try:
+                resposta, checksum = enviar_em_partes_com_checksum(file_paths[0], bucket, key_prefix)
+                return (resposta, [checksum]) if resposta is not None else (None, None)
+            except UploadEmPartesIndisponivel as e:
+                print(f"        -> AVISO: O storage não oferece upload em partes ({e}); usando o envio em uma única requisição.")
+                _partes_indisponivel = True
+        print(f"        -> Enviando {descricao} para o bucket '{bucket}' com prefixo '{key_prefix}'...")
+        corpo = CorpoMultipartComHash({'bucket': bucket, 'keyPrefix': key_prefix}, [('files', caminho) for caminho in file_paths])
+        response = requisitar(
+            "POST", f"{MINIO_SERVICE_API_URL}/storage/upload",
+            data=corpo, headers={'Content-Type': corpo.content_type}, timeout=UPLOAD_TIMEOUT,
+        )
+        if not corpo.completo():
+            print(f"        -> ERRO: {descricao} mudou de tamanho durante o envio.")
+            return None, None
+        print(f"        -> SUCESSO: {descricao} enviado(s) para o storage.")
+        return response.json(), list(corpo.checksums)
+    except requests.exceptions.RequestException as e:
+        print(f"        -> ERRO: Falha ao enviar {descricao} para o storage: {e}")
+        if e.response is not None:
+            print(f"        -> Status da Resposta: {e.response.status_code}")
+            print(f"        -> Corpo da Resposta: {e.response.text}")
+        return None, None
+    except OSError as e:
+        print(f"        -> ERRO: Falha ao ler {descricao} para envio: {e}")
+        return None, None
+
+
+def buscar_metadados(bucket, path):
+    """Consulta tamanho e data de modificação de um objeto. Lança RequestException em caso de falha."""
+    response = requisitar("POST", f"{MINIO_SERVICE_API_URL}/storage/metadata", json={"bucket": bucket, "path": path}, timeout=METADATA_TIMEOUT)
+    return response.json()
+
+
+def obter_cliente_async() -> httpx.AsyncClient:
+    """Cliente HTTP assíncrono dos endpoints async, com o mesmo limite de conexões da sessão síncrona."""
+    global _cliente_async
+    if _cliente_async is None:
+        _cliente_async = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_POOL_CONEXOES, max_keepalive_connections=HTTP_POOL_CONEXOES),
+            timeout=METADATA_TIMEOUT,
+        )
+    return _cliente_async
+
+
+async def fechar_cliente_async():
+    global _cliente_async
+    if _cliente_async is not None:
+        await _cliente_async.aclose()
+        _cliente_async = None
+
+
+async def buscar_metadados_async(bucket, path, tentativas: int = HTTP_TENTATIVAS):
+    """Versão assíncrona de buscar_metadados, com a mesma política de repetição de `requisitar`.
+
+    Lança httpx.HTTPError em caso de falha.
+    """
+    url = f"{MINIO_SERVICE_API_URL}/storage/metadata"
+    for tentativa in range(1, tentativas + 1):
+        try:
+            response = await obter_cliente_async().post(url, json={"bucket": bucket, "path": path})
+            if response.status_code not in HTTP_STATUS_REPETIR or tentativa == tentativas:
+                response.raise_for_status()
+                return response.json()
+        except (httpx.TransportError, httpx.TimeoutException):
+            if tentativa == tentativas:
+                raise
+        await asyncio.sleep(min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** (tentativa - 1)) * random.uniform(0.5, 1.0))
+
+
+async def buscar_metadados_em_paralelo(objetos: list) -> list:
+    """Consulta os metadados de vários (bucket, path) ao mesmo tempo, até METADATA_CONCORRENCIA por vez.
+
+    Retorna, na mesma ordem, o JSON de cada objeto ou a exceção da consulta que falhou.
+    """
+    limite = asyncio.Semaphore(METADATA_CONCORRENCIA)
+
+    async def consultar(bucket, path):
+        async with limite:
+            return await buscar_metadados_async(bucket, path)
+
+    return await asyncio.gather(*(consultar(bucket, path) for bucket, path in objetos), return_exceptions=True)
+
+
+def metadados_locais(file_path):
+    """Tamanho e mtime (UTC, sem fuso, como as colunas DateTime do banco) de um arquivo em disco."""
+    info = os.stat(file_path)
+    return info.st_size, datetime.fromtimestamp(info.st_mtime, tz=timezone.utc).replace(tzinfo=None)
+
+
+def converter_last_modified(valor):
+    """Converte o lastModified ISO 8601 do storage para datetime UTC sem fuso."""
+    if not valor:
+        return None
+    data = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    if data.tzinfo is not None:
+        data = data.astimezone(timezone.utc).replace(tzinfo=None)
+    return data
@@ -0,0 +1,77 @@
+"""Configuração comum dos testes.
+
+main, storage e conversor leem as variáveis de ambiente na importação, então
+elas são definidas aqui, antes de qualquer teste importar esses módulos: banco
+SQLite temporário, conversor simulado, cache de respostas desligado e storage
+e Mapoteca apontando para os servidores falsos de benchmark/servicos_falsos.py.
+"""
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmark import executar, servicos_falsos  # noqa: E402
+
+DIRETORIO = tempfile.mkdtemp(prefix="testes_gestao_")
+PORTA_SERVICOS = executar.porta_livre()
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(DIRETORIO, 'testes.sqlite')}",
+    "CACHE_ATIVO": "0",
+    "API_CONSUMIDOR_ATIVO": "0",
+    "API_PREPARAR_SCHEMA": "0",
+    "CONVERSOR_BACKEND": "simulado",
+    "CONVERSOR_INSTANCIAS": "2",
+    "MINIO_SERVICE_API_URL": f"http://127.0.0.1:{PORTA_SERVICOS}",
+    "MAPOTECA_SERVICE_URL": f"http://127.0.0.1:{PORTA_SERVICOS}/internal/processing-complete",
+    "SIP_LOCATION_INSIDE_CONTAINER": os.path.join(DIRETORIO, "sips"),
+    "NORMALIZED_OUTPUT_DIR": os.path.join(DIRETORIO, "normalizados"),
+    "UPLOAD_ESTADO_DIR": os.path.join(DIRETORIO, "uploads_em_partes"),
+    "HTTP_BACKOFF_BASE": "0.01",
+})
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def servicos():
+    """Storage e Mapoteca falsos na porta configurada em MINIO_SERVICE_API_URL."""
+    processo = servicos_falsos.iniciar(PORTA_SERVICOS)
+    yield f"http://127.0.0.1:{PORTA_SERVICOS}"
+    processo.terminate()
+
+
+@pytest.fixture
+def iniciar_storage():
+    """Sobe storages falsos adicionais (com falhas ou sem upload em partes); retorna a URL de cada um."""
+    processos = []
+
+    def iniciar(**opcoes):
+        porta = executar.porta_livre()
+        processos.append(servicos_falsos.iniciar(porta, **opcoes))
+        return f"http://127.0.0.1:{porta}"
+
+    yield iniciar
+    for processo in processos:
+        processo.terminate()
+
+
+@pytest.fixture
+def banco():
+    """Recria as tabelas do SQLite de testes e retorna o módulo main."""
+    import main
+    import models
+
+    models.Base.metadata.drop_all(main.engine)
+    main.preparar_schema()
+    return main
+
+
+@pytest.fixture
+def cliente(banco):
+    from fastapi.testclient import TestClient
+
+    with TestClient(banco.app) as cliente:
+        yield cliente
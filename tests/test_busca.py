@@ -0,0 +1,23 @@
+def arquivo(nome):
+    return {"nome": nome, "caminho_minio": f"x/{nome}", "checksum": "c", "formato": "pdf"}
+
+
+def buscar(cliente, q):
+    resposta = cliente.get("/aips/search", params={"q": q})
+    assert resposta.status_code == 200, resposta.text
+    return {item["transfer_id"]: item for item in resposta.json()}
+
+
+def test_busca_por_ra(cliente):
+    resposta = cliente.post("/aips/", json={"transfer_id": "t1", "titulo": "Planta", "ra": "RA-2024-0815", "originais": [arquivo("a.pdf")]})
+    assert resposta.status_code == 201, resposta.text
+    resposta = cliente.post("/aips/bulk", json=[{"transfer_id": "t2", "titulo": "Memorial", "ra": "RA-2024-0999", "originais": []}])
+    assert resposta.json()["criados"] == 1
+
+    encontrados = buscar(cliente, "2024-0815")
+    assert list(encontrados) == ["t1"]
+    assert encontrados["t1"]["ra"] == "RA-2024-0815"
+
+    encontrados = buscar(cliente, "ra-2024-0999")
+    assert list(encontrados) == ["t2"]
+    assert encontrados["t2"]["ra"] == "RA-2024-0999"
@@ -0,0 +1,159 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+import cache
+from test_pastas import criar_aip, criar_pasta
+
+
+@pytest.fixture
+def respostas(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_MAX_BYTES", 100)
+    monkeypatch.setattr(cache, "CACHE_MAX_ITEM_BYTES", 60)
+    return cache.CacheRespostas(fakeredis.FakeRedis(), ativo=True)
+
+
+def valor(tamanho):
+    """Valor cujo JSON tem exatamente `tamanho` bytes."""
+    return "x" * (tamanho - 2)
+
+
+def test_contabiliza_bytes_e_regrava_sem_duplicar(respostas):
+    respostas.gravar("a", valor(30))
+    respostas.gravar("b", valor(20))
+    respostas.gravar("a", valor(10))
+
+    assert respostas.obter("a") == valor(10)
+    estatisticas = respostas.estatisticas()
+    assert (estatisticas["bytes"], estatisticas["chaves"], estatisticas["hits"]) == (30, 2, 1)
+
+
+def test_despeja_as_chaves_menos_usadas(respostas):
+    # 20 valores de 5 bytes enchem o cache; o 21º passa do limite e o despejo
+    # retira um bloco de 16 chaves, das menos usadas para as mais usadas.
+    chaves = [f"k{indice:02d}" for indice in range(21)]
+    for chave in chaves[:20]:
+        respostas.gravar(chave, valor(5))
+    respostas.obter("k00")
+
+    respostas.gravar(chaves[20], valor(5))
+
+    restantes = [chave for chave in chaves if respostas.obter(chave) is not None]
+    assert restantes == ["k00", "k17", "k18", "k19", "k20"]
+    estatisticas = respostas.estatisticas()
+    assert (estatisticas["bytes"], estatisticas["chaves"], estatisticas["evictions"]) == (25, 5, 16)
+
+
+def test_valor_acima_do_limite_por_item_nao_e_guardado(respostas):
+    respostas.gravar("grande", valor(61))
+
+    assert respostas.obter("grande") is None
+    assert respostas.estatisticas()["bytes"] == 0
+
+
+def test_invalidar_libera_os_bytes(respostas):
+    respostas.gravar("a", valor(30))
+    respostas.gravar("b", valor(20))
+
+    respostas.invalidar("a", "inexistente")
+
+    assert respostas.obter("a") is None
+    assert respostas.estatisticas()["bytes"] == 20
+
+
+def test_redis_indisponivel_vira_miss():
+    servidor = fakeredis.FakeServer()
+    servidor.connected = False
+    respostas = cache.CacheRespostas(fakeredis.FakeRedis(server=servidor), ativo=True)
+
+    respostas.gravar("a", valor(10))
+    assert respostas.obter("a") is None
+
+
+def test_cliente_async_compartilha_chaves_e_contabilidade(respostas):
+    servidor = fakeredis.FakeServer()
+    sincrono = cache.CacheRespostas(fakeredis.FakeRedis(server=servidor), ativo=True)
+    assincrono = cache.CacheRespostasAsync(fakeredis.FakeAsyncRedis(server=servidor), ativo=True)
+
+    async def usar():
+        for indice in range(20):
+            await assincrono.gravar(f"k{indice:02d}", valor(5))
+        assert await assincrono.obter("k00") == valor(5)
+        await assincrono.gravar("k20", valor(5))
+        await assincrono.gravar("grande", valor(61))
+        sincrono.invalidar("k20")
+        resultado = [await assincrono.obter(f"k{indice:02d}") is not None for indice in range(21)]
+        await assincrono.fechar()
+        return resultado
+
+    presentes = asyncio.run(usar())
+
+    assert [indice for indice, presente in enumerate(presentes) if presente] == [0, 17, 18, 19]
+    estatisticas = sincrono.estatisticas()
+    assert (estatisticas["bytes"], estatisticas["chaves"], estatisticas["evictions"]) == (20, 4, 16)
+
+
+@pytest.fixture
+def api(banco, cliente, servicos, monkeypatch):
+    """Cliente da API com o cache de respostas ligado sobre um Redis falso."""
+    servidor = fakeredis.FakeServer()
+    monkeypatch.setattr(banco, "cache_respostas", cache.CacheRespostas(fakeredis.FakeRedis(server=servidor), ativo=True))
+    monkeypatch.setattr(banco, "cache_respostas_async", cache.CacheRespostasAsync(fakeredis.FakeAsyncRedis(server=servidor), ativo=True))
+    return cliente
+
+
+def ler(api, url):
+    resposta = api.get(url)
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()
+
+
+def test_registro_invalida_o_conteudo_da_pasta(api, banco):
+    pasta = criar_pasta(api, "raiz")
+    assert ler(api, f"/pastas/{pasta}")["aips"] == []
+
+    criar_aip(api, "novo", pasta, "raiz/a.pdf")
+
+    assert [aip["cod_id"] for aip in ler(api, f"/pastas/{pasta}")["aips"]] == ["novo"]
+    assert banco.cache_respostas.estatisticas()["hits"] == 0
+
+
+def test_renomear_pasta_invalida_a_localizacao_dos_aips(api, banco):
+    raiz = criar_pasta(api, "raiz")
+    filha = criar_pasta(api, "filha", raiz)
+    criar_aip(api, "a", filha, "raiz/filha/a.pdf")
+    assert ler(api, "/aips/a/location")["path"] == "raiz/filha/a.pdf"
+    assert ler(api, "/aips/a/location")["path"] == "raiz/filha/a.pdf"
+    assert banco.cache_respostas.estatisticas()["hits"] == 1
+
+    assert api.put(f"/pastas/{filha}", json={"nom_pasta": "nova"}).status_code == 200
+
+    assert ler(api, "/aips/a/location")["path"] == "raiz/nova/a.pdf"
+    assert [p["nom_pasta"] for p in ler(api, "/pastas/")] == ["raiz", "nova"]
+
+
+def test_renomear_aip_invalida_os_detalhes(api):
+    criar_aip(api, "a", None, "a.pdf")
+    assert ler(api, "/aips/a/details")["titulo"] == "a"
+
+    assert api.put("/aips/a/rename", json={"novo_titulo": "Planta baixa"}).status_code == 200
+
+    assert ler(api, "/aips/a/details")["titulo"] == "planta_baixa"
+
+
+def test_deletar_invalida_aips_e_pastas(api):
+    raiz = criar_pasta(api, "raiz")
+    filha = criar_pasta(api, "filha", raiz)
+    criar_aip(api, "a", raiz, "raiz/a.pdf")
+    criar_aip(api, "b", filha, "raiz/filha/b.pdf")
+    for url in ("/aips/a/location", "/aips/b/details", f"/pastas/{raiz}", "/pastas/"):
+        ler(api, url)
+
+    assert api.post("/aips/a/logical-delete").status_code == 200
+    assert api.delete(f"/pastas/{filha}").status_code == 200
+
+    assert api.get("/aips/a/location").status_code == 404
+    assert api.get("/aips/b/details").status_code == 404
+    assert ler(api, f"/pastas/{raiz}")["filhas"] == []
+    assert [p["cod_id"] for p in ler(api, "/pastas/")] == [raiz]
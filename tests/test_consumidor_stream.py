@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+
+import fakeredis
+import pytest
+
+import consumidor_stream
+
+STREAM = "fila_teste"
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    monkeypatch.setattr(consumidor_stream, "STREAM_BLOQUEIO_MS", 10)
+    monkeypatch.setattr(consumidor_stream, "STREAM_MAX_TENTATIVAS", 3)
+    monkeypatch.setattr(consumidor_stream, "STREAM_BACKOFF_BASE", 5)
+    return fakeredis.FakeRedis()
+
+
+def consumidor(cliente, nome="c1", processar=None, desistencias=None):
+    def ao_desistir(payload, erro):
+        if desistencias is not None:
+            desistencias.append((payload, erro))
+
+    c = consumidor_stream.ConsumidorStream(
+        cliente, STREAM, processar or (lambda payload: None), ao_desistir, 2, threading.Event(), grupo="g", consumidor=nome,
+    )
+    c.garantir_grupo()
+    return c
+
+
+def publicar(cliente, **campos):
+    return cliente.xadd(STREAM, {"payload": json.dumps({"transferId": "t1"}), **campos})
+
+
+def falhar(payload):
+    raise RuntimeError("storage fora do ar")
+
+
+def test_mensagem_processada_sai_do_stream(cliente):
+    processados = []
+    c = consumidor(cliente, processar=processados.append)
+    publicar(cliente)
+
+    for id_mensagem, campos in c._buscar(2):
+        c._executar_mensagem(id_mensagem, campos)
+
+    assert processados == [json.dumps({"transferId": "t1"}).encode()]
+    assert cliente.xlen(STREAM) == 0
+    assert cliente.xpending(STREAM, "g")["pending"] == 0
+
+
+def test_mensagem_abandonada_e_reivindicada_por_outro_consumidor(cliente, monkeypatch):
+    caido = consumidor(cliente, "caido")
+    id_mensagem = publicar(cliente)
+    assert [i for i, _ in caido._buscar(1)] == [id_mensagem]
+
+    vivo = consumidor(cliente, "vivo")
+    assert vivo._buscar(1) == []  # ainda dentro de STREAM_CLAIM_IDLE_MS
+
+    monkeypatch.setattr(consumidor_stream, "STREAM_CLAIM_IDLE_MS", 0)
+    reivindicadas = vivo._buscar(1)
+    assert [i for i, _ in reivindicadas] == [id_mensagem]
+    vivo._executar_mensagem(*reivindicadas[0])
+    assert cliente.xlen(STREAM) == 0
+
+
+def test_mensagem_que_derruba_os_consumidores_vai_para_a_dlq(cliente, monkeypatch):
+    monkeypatch.setattr(consumidor_stream, "STREAM_CLAIM_IDLE_MS", 0)
+    desistencias = []
+    publicar(cliente)
+    # Cada consumidor recebe a mensagem e cai sem confirmá-la: a terceira
+    # entrega é a última tentativa; a quarta já não é processada.
+    for indice in range(3):
+        assert consumidor(cliente, f"c{indice}", desistencias=desistencias)._buscar(1) != []
+
+    assert consumidor(cliente, "c3", desistencias=desistencias)._buscar(1) == []
+    assert cliente.xlen(STREAM) == 0
+    assert cliente.xlen(f"{STREAM}:dlq") == 1
+    assert "sem confirmação" in desistencias[0][1]
+
+
+def test_falha_agenda_retry_com_backoff_e_volta_ao_stream(cliente):
+    c = consumidor(cliente, processar=falhar)
+    publicar(cliente)
+
+    antes = time.time()
+    c._executar_mensagem(*c._buscar(1)[0])
+
+    assert cliente.xlen(STREAM) == 0
+    [(membro, horario)] = cliente.zrange(f"{STREAM}:retry", 0, -1, withscores=True)
+    assert antes + 2.5 <= horario <= time.time() + 5
+    agendada = json.loads(membro)
+    assert agendada["tentativa"] == "2" and agendada["ultimo_erro"] == "storage fora do ar"
+
+    c._promover_retries()
+    assert cliente.xlen(STREAM) == 0  # backoff ainda não terminou
+
+    cliente.zadd(f"{STREAM}:retry", {membro: 0})
+    c._promover_retries()
+    assert cliente.zcard(f"{STREAM}:retry") == 0
+    [(id_mensagem, campos)] = c._buscar(1)
+    assert campos[b"tentativa"] == b"2"
+
+    antes = time.time()
+    c._executar_mensagem(id_mensagem, campos)
+    [(_, horario)] = cliente.zrange(f"{STREAM}:retry", 0, -1, withscores=True)
+    assert antes + 5 <= horario <= time.time() + 10
+
+
+def test_tentativas_esgotadas_vao_para_a_dlq(cliente):
+    desistencias = []
+    c = consumidor(cliente, processar=falhar, desistencias=desistencias)
+    publicar(cliente, tentativa="3")
+
+    c._executar_mensagem(*c._buscar(1)[0])
+
+    assert cliente.xlen(STREAM) == 0 and cliente.zcard(f"{STREAM}:retry") == 0
+    [(_, morta)] = cliente.xrange(f"{STREAM}:dlq")
+    assert morta[b"erro"] == b"storage fora do ar" and morta[b"tentativa"] == b"3"
+    assert desistencias == [(json.dumps({"transferId": "t1"}).encode(), "storage fora do ar")]
+
+
+@pytest.mark.parametrize("campos", [{"payload": "{nao e json"}, {"payload": "[]"}, {"outro": "x"}])
+def test_mensagem_ilegivel_vai_direto_para_a_dlq(cliente, banco, campos):
+    c = consumidor(cliente, processar=banco.processar_payload_stream)
+    cliente.xadd(STREAM, campos)
+
+    c._executar_mensagem(*c._buscar(1)[0])
+
+    assert cliente.xlen(STREAM) == 0 and cliente.zcard(f"{STREAM}:retry") == 0
+    [(_, morta)] = cliente.xrange(f"{STREAM}:dlq")
+    assert morta[b"tentativa"] == b"1"
+
+
+def test_executar_processa_ate_parar(cliente):
+    processados = []
+    c = consumidor(cliente, processar=processados.append)
+    for _ in range(5):
+        publicar(cliente)
+
+    thread = threading.Thread(target=c.executar)
+    thread.start()
+    limite = time.monotonic() + 5
+    while len(processados) < 5 and time.monotonic() < limite:
+        time.sleep(0.01)
+    c.parar.set()
+    thread.join(5)
+
+    assert len(processados) == 5
+    assert not thread.is_alive()
+    assert cliente.xlen(STREAM) == 0
@@ -0,0 +1,111 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import conversor
+
+
+class InstanciaRegistrada(conversor.InstanciaSimulada):
+    """InstanciaSimulada que anota quem converteu cada documento e pode travar ou cair sob demanda."""
+
+    conversoes = []
+    travar = set()
+    cair = set()
+
+    def converter(self, origem, destino):
+        nome = os.path.basename(origem)
+        if nome in self.travar:
+            time.sleep(self.timeout)
+            raise conversor.TimeoutConversao(f"{self} excedeu {self.timeout}s convertendo '{nome}'")
+        if nome in self.cair:
+            self._ativa = False
+            raise RuntimeError("processo terminou")
+        time.sleep(0.05)
+        super().converter(origem, destino)
+        self.conversoes.append((self.indice, nome))
+
+
+@pytest.fixture
+def pool(tmp_path):
+    InstanciaRegistrada.conversoes = []
+    InstanciaRegistrada.travar = set()
+    InstanciaRegistrada.cair = set()
+    pool = conversor.PoolConversao(InstanciaRegistrada, 3, timeout=0.2)
+    pool.iniciar()
+    yield pool
+    pool.encerrar()
+
+
+def documento(tmp_path, nome):
+    origem = tmp_path / nome
+    origem.write_bytes(b"conteudo")
+    return str(origem), str(tmp_path / f"{nome}.pdf")
+
+
+def test_fila_distribui_os_documentos_entre_as_instancias(pool, tmp_path):
+    documentos = [documento(tmp_path, f"doc{i}.odt") for i in range(9)]
+    with ThreadPoolExecutor(9) as executor:
+        resultados = list(executor.map(lambda d: pool.converter(*d), documentos))
+
+    assert resultados == [destino for _, destino in documentos]
+    assert all(open(destino, "rb").read() == conversor.PDF_SIMULADO for destino in resultados)
+    assert len(InstanciaRegistrada.conversoes) == 9
+    assert {indice for indice, _ in InstanciaRegistrada.conversoes} == {0, 1, 2}
+
+
+def test_instancia_travada_e_reiniciada(pool, tmp_path):
+    InstanciaRegistrada.travar = {"travado.doc"}
+
+    with pytest.raises(conversor.TimeoutConversao):
+        pool.converter(*documento(tmp_path, "travado.doc"))
+
+    assert sum(instancia.reinicios for instancia in pool.instancias) == 1
+    assert all(instancia.ativa() for instancia in pool.instancias)
+    destino = pool.converter(*documento(tmp_path, "seguinte.doc"))
+    assert os.path.exists(destino)
+
+
+def test_instancia_que_cai_e_reiniciada_e_o_erro_vira_erro_conversao(pool, tmp_path):
+    InstanciaRegistrada.cair = {"quebra.xls"}
+
+    with pytest.raises(conversor.ErroConversao) as erro:
+        pool.converter(*documento(tmp_path, "quebra.xls"))
+
+    assert not isinstance(erro.value, conversor.TimeoutConversao)
+    assert "processo terminou" in str(erro.value)
+    assert sum(instancia.reinicios for instancia in pool.instancias) == 1
+    assert all(instancia.ativa() for instancia in pool.instancias)
+
+
+def test_instancia_inativa_e_reiniciada_antes_da_proxima_conversao(tmp_path):
+    InstanciaRegistrada.conversoes = []
+    pool = conversor.PoolConversao(InstanciaRegistrada, 1, timeout=0.2)
+    pool.iniciar()
+    try:
+        pool.instancias[0].encerrar()
+        pool.converter(*documento(tmp_path, "doc.odt"))
+        assert pool.instancias[0].reinicios == 1
+    finally:
+        pool.encerrar()
+
+
+def test_erro_sem_queda_nao_reinicia_a_instancia(pool, tmp_path):
+    origem, _ = documento(tmp_path, "doc.odt")
+
+    with pytest.raises(conversor.ErroConversao):
+        pool.converter(origem, str(tmp_path / "inexistente" / "doc.pdf"))
+
+    assert sum(instancia.reinicios for instancia in pool.instancias) == 0
+
+
+def test_converter_apos_encerrar_falha_sem_bloquear(tmp_path):
+    pool = conversor.PoolConversao(InstanciaRegistrada, 2, timeout=0.2)
+    pool.iniciar()
+    pool.encerrar()
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(pool.converter, *documento(tmp_path, "doc.odt"))
+        with pytest.raises(conversor.ErroConversao, match="encerrado"):
+            future.result(timeout=5)
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+import storage
+
+CONTEUDO = os.urandom(4096)
+
+
+@pytest.fixture
+def ingestao(banco, servicos, tmp_path, monkeypatch):
+    """Ingere SIPs pelo fluxo do worker e anota os arquivos enviados ao storage por bucket."""
+    monkeypatch.setattr(banco.cache_conversao, "diretorio", str(tmp_path / "cache"))
+    monkeypatch.setattr(banco, "SIP_LOCATION_INSIDE_CONTAINER", str(tmp_path / "sips"))
+    enviados = []
+    enviar = storage.enviar_lote_para_storage_com_checksum
+
+    def enviar_registrando(caminhos, bucket, prefixo):
+        enviados.extend((bucket, os.path.basename(caminho)) for caminho in caminhos)
+        return enviar(caminhos, bucket, prefixo)
+
+    monkeypatch.setattr(storage, "enviar_lote_para_storage_com_checksum", enviar_registrando)
+
+    def ingerir(transfer_id, nome, ra):
+        sip = os.path.join(banco.SIP_LOCATION_INSIDE_CONTAINER, transfer_id)
+        os.makedirs(sip)
+        with open(os.path.join(sip, nome), "wb") as f:
+            f.write(CONTEUDO)
+        enviados.clear()
+        banco.processar_transferencia({"transferId": transfer_id, "ra": ra})
+        return list(enviados)
+
+    return ingerir
+
+
+def caminho_original(banco, transfer_id):
+    db = banco.SessionLocal()
+    try:
+        return db.query(banco.models.TpArquivoOriginal.dsc_caminho_minio).filter_by(cod_aip=transfer_id).scalar()
+    finally:
+        db.close()
+
+
+def test_conteudo_repetido_reaproveita_o_objeto(banco, ingestao):
+    assert ("originais", "x.txt") in ingestao("aip-1", "x.txt", "RA1")
+
+    enviados = ingestao("aip-2", "y.txt", "RA2")
+
+    assert ("originais", "y.txt") not in enviados
+    assert caminho_original(banco, "aip-2") == "RA1/x.txt"
+
+
+def test_objeto_compartilhado_so_sai_com_a_ultima_referencia(banco, cliente, ingestao):
+    ingestao("aip-1", "x.txt", "RA1")
+    ingestao("aip-2", "y.txt", "RA2")
+    compartilhado = {"bucket": "originais", "path": "RA1/x.txt"}
+
+    primeira = cliente.post("/aips/aip-1/logical-delete").json()["filesToDelete"]
+    assert compartilhado not in primeira
+
+    ultima = cliente.post("/aips/aip-2/logical-delete").json()["filesToDelete"]
+    assert compartilhado in ultima
+
+
+def test_objeto_deletado_antes_do_registro_e_reenviado(banco, ingestao, monkeypatch, capsys):
+    ingestao("aip-1", "x.txt", "RA1")
+    registrar_aip = banco.registrar_aip
+    chamadas = []
+
+    def deletar_referencias_e_registrar(db, **payload):
+        if not chamadas:
+            outra = banco.SessionLocal()
+            try:
+                outra.query(banco.models.TpAip).filter_by(cod_id="aip-1").update({"dhs_deleted": banco.datetime.utcnow()})
+                outra.commit()
+            finally:
+                outra.close()
+        chamadas.append(payload["transfer_id"])
+        return registrar_aip(db, **payload)
+
+    monkeypatch.setattr(banco, "registrar_aip", deletar_referencias_e_registrar)
+    enviados = ingestao("aip-2", "y.txt", "RA2")
+
+    assert chamadas == ["aip-2", "aip-2"]
+    assert "foram deletados no meio tempo" in capsys.readouterr().out
+    assert ("originais", "y.txt") in enviados
+    assert caminho_original(banco, "aip-2") == "RA2/y.txt"
+
+
+def test_dedup_desativado_envia_sempre(banco, ingestao, monkeypatch):
+    monkeypatch.setattr(banco, "DEDUP_ATIVO", False)
+    ingestao("aip-1", "x.txt", "RA1")
+
+    enviados = ingestao("aip-2", "y.txt", "RA2")
+
+    assert ("originais", "y.txt") in enviados
+    assert caminho_original(banco, "aip-2") == "RA2/y.txt"
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+import conversor
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversor, "_versao", "simulado")
+    return conversor.CacheConversao(str(tmp_path / "cache"), max_bytes=10_000, ativo=True)
+
+
+def pdf(tmp_path, nome, tamanho):
+    caminho = tmp_path / nome
+    caminho.write_bytes(os.urandom(tamanho))
+    return str(caminho)
+
+
+def test_miss_e_hit_com_checksum_e_tamanho(cache, tmp_path):
+    chave = cache.chave("a" * 64)
+    destino = str(tmp_path / "saida.pdf")
+
+    assert cache.obter(chave, destino) is None
+    origem = pdf(tmp_path, "gerado.pdf", 3000)
+    checksum = cache.guardar(chave, origem)
+
+    assert checksum == hashlib.sha256(open(origem, "rb").read()).hexdigest()
+    assert cache.obter(chave, destino) == {"checksum": checksum, "tamanho": 3000}
+    assert open(destino, "rb").read() == open(origem, "rb").read()
+    estatisticas = cache.estatisticas()
+    assert (estatisticas["hits"], estatisticas["misses"], estatisticas["bytes"]) == (1, 1, 3000)
+
+
+def test_despejo_remove_as_entradas_menos_usadas(cache, tmp_path):
+    chaves = [cache.chave(str(i) * 64) for i in range(4)]
+    for indice, chave in enumerate(chaves[:3]):
+        cache.guardar(chave, pdf(tmp_path, f"{indice}.pdf", 3000))
+        # O mtime marca o último uso; espaça as gravações para a ordem ser estável.
+        os.utime(cache._caminho(chave), (time.time() - 100 + indice, time.time() - 100 + indice))
+    cache.obter(chaves[0], str(tmp_path / "usado.pdf"))
+
+    cache.guardar(chaves[3], pdf(tmp_path, "3.pdf", 3000))
+
+    assert cache.obter(chaves[1], str(tmp_path / "x.pdf")) is None
+    assert not os.path.exists(cache._caminho_metadados(cache._caminho(chaves[1])))
+    assert all(cache.obter(chave, str(tmp_path / "x.pdf")) for chave in (chaves[0], chaves[2], chaves[3]))
+    assert cache.estatisticas()["evictions"] == 1
+    assert cache.estatisticas()["bytes"] == 9000
+
+
+def test_nova_versao_do_conversor_invalida_o_cache(cache, tmp_path, monkeypatch):
+    checksum_origem = "b" * 64
+    cache.guardar(cache.chave(checksum_origem), pdf(tmp_path, "gerado.pdf", 100))
+
+    monkeypatch.setattr(conversor, "_versao", "unoconv:LibreOffice 7.6")
+
+    assert cache.obter(cache.chave(checksum_origem), str(tmp_path / "saida.pdf")) is None
+
+
+def test_cache_desativado_nao_guarda_nem_consulta(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversor, "_versao", "simulado")
+    cache = conversor.CacheConversao(str(tmp_path / "cache"), ativo=False)
+    chave = cache.chave("c" * 64)
+
+    assert cache.guardar(chave, pdf(tmp_path, "gerado.pdf", 100)) is None
+    assert cache.obter(chave, str(tmp_path / "saida.pdf")) is None
+    assert not os.path.exists(cache.diretorio)
+
+
+def test_mesmo_nome_com_extensoes_diferentes_e_limpeza_da_saida(banco, servicos, tmp_path, monkeypatch):
+    monkeypatch.setattr(banco.cache_conversao, "diretorio", str(tmp_path / "cache"))
+    monkeypatch.setattr(banco, "SIP_LOCATION_INSIDE_CONTAINER", str(tmp_path / "sips"))
+    transfer_id = "sip-extensoes"
+    sip = os.path.join(banco.SIP_LOCATION_INSIDE_CONTAINER, transfer_id)
+    os.makedirs(sip)
+    for nome in ("a.doc", "a.docx"):
+        with open(os.path.join(sip, nome), "wb") as f:
+            f.write(os.urandom(1000))
+
+    banco.processar_transferencia({"transferId": transfer_id, "ra": "RA1"})
+
+    db = banco.SessionLocal()
+    try:
+        preservados = db.query(banco.models.TpArquivoPreservacao).filter_by(cod_aip=transfer_id).all()
+        assert sorted(p.nom_arquivo for p in preservados) == ["a.doc.pdf", "a.docx.pdf"]
+        assert sorted(p.dsc_caminho_minio for p in preservados) == ["RA1/a.doc.pdf", "RA1/a.docx.pdf"]
+    finally:
+        db.close()
+    assert not os.path.exists(os.path.join(banco.NORMALIZED_OUTPUT_DIR, transfer_id))
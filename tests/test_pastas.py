@@ -0,0 +1,128 @@
+import json
+
+
+def criar_pasta(cliente, nome, cod_pai=None):
+    resposta = cliente.post("/pastas/", json={"nom_pasta": nome, "cod_pai": cod_pai})
+    assert resposta.status_code == 201, resposta.text
+    return resposta.json()["cod_id"]
+
+
+def criar_aip(cliente, transfer_id, cod_pasta, *caminhos):
+    originais = [{"nome": caminho.rsplit("/", 1)[-1], "caminho_minio": caminho, "checksum": caminho, "formato": "pdf"} for caminho in caminhos]
+    resposta = cliente.post("/aips/", json={"transfer_id": transfer_id, "titulo": transfer_id, "cod_pasta": cod_pasta, "originais": originais})
+    assert resposta.status_code == 201, resposta.text
+
+
+def aip(banco, transfer_id):
+    db = banco.SessionLocal()
+    try:
+        return db.query(banco.models.TpAip).filter_by(cod_id=transfer_id).one()
+    finally:
+        db.close()
+
+
+def test_deletar_pasta_ignora_aips_ja_deletados(banco, cliente):
+    raiz = criar_pasta(cliente, "raiz")
+    filha = criar_pasta(cliente, "filha", raiz)
+    neta = criar_pasta(cliente, "neta", filha)
+    criar_aip(cliente, "ativo", filha, "raiz/filha/ativo.pdf")
+    criar_aip(cliente, "ja-deletado", neta, "raiz/filha/neta/antigo.pdf")
+    criar_aip(cliente, "neto", neta, "raiz/filha/neta/neto.pdf")
+    criar_aip(cliente, "fora", raiz, "raiz/fora.pdf")
+    assert cliente.post("/aips/ja-deletado/logical-delete").json()["filesToDelete"] == [
+        {"bucket": "originais", "path": "raiz/filha/neta/antigo.pdf"}
+    ]
+    deletado_em = aip(banco, "ja-deletado").dhs_deleted
+
+    resposta = cliente.delete(f"/pastas/{filha}")
+
+    assert resposta.status_code == 200, resposta.text
+    assert sorted(arquivo["path"] for arquivo in resposta.json()["filesToDelete"]) == [
+        "raiz/filha/ativo.pdf", "raiz/filha/neta/neto.pdf",
+    ]
+    assert aip(banco, "ja-deletado").dhs_deleted == deletado_em
+    assert all(aip(banco, cod_id).cod_pasta is None for cod_id in ("ativo", "ja-deletado", "neto"))
+    assert aip(banco, "fora").dhs_deleted is None and aip(banco, "fora").cod_pasta == raiz
+    assert [pasta["cod_id"] for pasta in cliente.get("/pastas/").json()] == [raiz]
+
+
+def test_deletar_pasta_em_ndjson(cliente):
+    raiz = criar_pasta(cliente, "raiz")
+    criar_aip(cliente, "a", raiz, "raiz/a.pdf", "raiz/b.pdf")
+
+    resposta = cliente.delete(f"/pastas/{raiz}", params={"stream": "true"})
+
+    assert resposta.headers["content-type"].startswith("application/x-ndjson")
+    assert sorted(json.loads(linha)["path"] for linha in resposta.text.splitlines()) == ["raiz/a.pdf", "raiz/b.pdf"]
+
+
+def pastas(banco):
+    db = banco.SessionLocal()
+    try:
+        return {p.nom_pasta: (p.dsc_caminho, p.dsc_caminho_ids, p.num_profundidade) for p in db.query(banco.models.TpPasta)}
+    finally:
+        db.close()
+
+
+def caminhos_dos_originais(banco):
+    db = banco.SessionLocal()
+    try:
+        return sorted((a.cod_aip, a.dsc_caminho_minio) for a in db.query(banco.models.TpArquivoOriginal))
+    finally:
+        db.close()
+
+
+def montar_arvore(cliente):
+    """raiz/filha/neta e raiz/filha2, com um AIP de fora da subárvore reaproveitando um objeto de dentro."""
+    raiz = criar_pasta(cliente, "raiz")
+    filha = criar_pasta(cliente, "filha", raiz)
+    neta = criar_pasta(cliente, "neta", filha)
+    filha2 = criar_pasta(cliente, "filha2", raiz)
+    criar_aip(cliente, "na-filha", filha, "raiz/filha/a.pdf", "outro/reaproveitado.pdf")
+    criar_aip(cliente, "na-neta", neta, "raiz/filha/neta/b.pdf")
+    criar_aip(cliente, "na-filha2", filha2, "raiz/filha2/c.pdf", "raiz/filha/neta/b.pdf")
+    return {"raiz": raiz, "filha": filha, "neta": neta, "filha2": filha2}
+
+
+def test_renomear_pasta_reescreve_a_subarvore(banco, cliente):
+    ids = montar_arvore(cliente)
+
+    resposta = cliente.put(f"/pastas/{ids['filha']}", json={"nom_pasta": "nova"})
+
+    assert resposta.status_code == 200, resposta.text
+    assert pastas(banco) == {
+        "raiz": ("raiz", f"/{ids['raiz']}/", 0),
+        "nova": ("raiz/nova", f"/{ids['raiz']}/{ids['filha']}/", 1),
+        "neta": ("raiz/nova/neta", f"/{ids['raiz']}/{ids['filha']}/{ids['neta']}/", 2),
+        "filha2": ("raiz/filha2", f"/{ids['raiz']}/{ids['filha2']}/", 1),
+    }
+    assert caminhos_dos_originais(banco) == [
+        ("na-filha", "outro/reaproveitado.pdf"),
+        ("na-filha", "raiz/nova/a.pdf"),
+        ("na-filha2", "raiz/filha2/c.pdf"),
+        ("na-filha2", "raiz/nova/neta/b.pdf"),
+        ("na-neta", "raiz/nova/neta/b.pdf"),
+    ]
+    assert sorted((op["source"], op["destination"]) for op in resposta.json()["moveOperations"]) == [
+        ("raiz/filha/a.pdf", "raiz/nova/a.pdf"),
+        ("raiz/filha/neta/b.pdf", "raiz/nova/neta/b.pdf"),
+    ]
+
+
+def test_renomear_pasta_em_ndjson_igual_ao_json(banco, cliente):
+    respostas = {}
+    for stream in (False, True):
+        banco.models.Base.metadata.drop_all(banco.engine)
+        banco.preparar_schema()
+        ids = montar_arvore(cliente)
+        resposta = cliente.put(f"/pastas/{ids['filha']}", params={"stream": stream}, json={"nom_pasta": "nova"})
+        assert resposta.status_code == 200, resposta.text
+        if stream:
+            assert resposta.headers["content-type"].startswith("application/x-ndjson")
+            operacoes = [json.loads(linha) for linha in resposta.text.splitlines()]
+        else:
+            operacoes = resposta.json()["moveOperations"]
+        respostas[stream] = sorted(json.dumps(op, sort_keys=True) for op in operacoes)
+
+    assert respostas[True] == respostas[False]
+    assert len(respostas[True]) == 2
@@ -0,0 +1,116 @@
+import os
+import random
+import threading
+import time
+
+import pytest
+
+import pipeline
+
+
+class Item:
+    def __init__(self, numero):
+        self.numero = numero
+        self.etapas = []
+
+
+def estagio(nome, atraso=0.005, falhar_em=None, parar_em=None, chamadas=None):
+    def funcao(item):
+        time.sleep(random.uniform(0, atraso))
+        if chamadas is not None:
+            chamadas.append(item.numero)
+        if item.numero == falhar_em:
+            raise ValueError(f"{nome} falhou no item {item.numero}")
+        item.etapas.append(nome)
+        return item.numero != parar_em
+    return funcao
+
+
+def test_todos_os_itens_passam_por_todos_os_estagios():
+    itens = [Item(numero) for numero in range(30)]
+    lotes = [itens[inicio:inicio + 4] for inicio in range(0, 30, 4)]
+    estagios = [
+        ("lote", lambda lote: lote, 2),
+        ("a", estagio("a"), 3),
+        ("b", estagio("b", parar_em=7), 2),
+        ("c", estagio("c"), 3),
+    ]
+
+    pipeline.PipelineEmEstagios(estagios, capacidade_fila=2).executar(lotes)
+
+    assert [item.numero for item in itens] == list(range(30))
+    assert all(item.etapas == (["a", "b"] if item.numero == 7 else ["a", "b", "c"]) for item in itens)
+
+
+def test_primeira_falha_cancela_e_esvazia_as_filas():
+    itens = [Item(numero) for numero in range(200)]
+    chamadas_c = []
+    estagios = [
+        ("a", estagio("a", atraso=0), 2),
+        ("b", estagio("b", atraso=0.002, falhar_em=5), 2),
+        ("c", estagio("c", atraso=0, chamadas=chamadas_c), 1),
+    ]
+    execucao = pipeline.PipelineEmEstagios(estagios, capacidade_fila=1)
+    antes = set(threading.enumerate())
+
+    with pytest.raises(ValueError, match="b falhou no item 5"):
+        execucao.executar(itens)
+
+    assert execucao.cancelado.is_set()
+    assert len(chamadas_c) < 20
+    assert 5 not in chamadas_c
+    assert not any(thread.is_alive() for thread in set(threading.enumerate()) - antes)
+
+
+def test_so_a_primeira_excecao_e_relancada():
+    itens = [Item(numero) for numero in range(10)]
+
+    def falhar(item):
+        time.sleep(0.01 * item.numero)
+        raise KeyError(item.numero)
+
+    with pytest.raises(KeyError) as erro:
+        pipeline.PipelineEmEstagios([("a", falhar, 4)], capacidade_fila=10).executar(itens)
+    assert erro.value.args == (0,)
+
+
+@pytest.fixture
+def sip(banco, servicos, tmp_path, monkeypatch):
+    monkeypatch.setattr(banco.cache_conversao, "diretorio", str(tmp_path / "cache"))
+    diretorio = tmp_path / "sip"
+    diretorio.mkdir()
+    for indice in range(8):
+        (diretorio / f"doc{indice}.txt").write_bytes(os.urandom(100 + indice))
+    return str(diretorio)
+
+
+def test_payloads_seguem_a_listagem_do_diretorio(banco, sip, monkeypatch):
+    normalizar = banco.normalize_to_pdfa
+
+    def normalizar_em_ordem_inversa(caminho, *args):
+        # Os primeiros arquivos da listagem terminam por último.
+        time.sleep(0.01 * (8 - int(os.path.basename(caminho)[3])))
+        return normalizar(caminho, *args)
+
+    monkeypatch.setattr(banco, "normalize_to_pdfa", normalizar_em_ordem_inversa)
+    monkeypatch.setattr(banco, "INGEST_CONVERSAO_WORKERS", 8)
+
+    originais, preservados = banco.processar_arquivos_do_sip("sip-ordem", sip, "RA1")
+
+    listagem = os.listdir(sip)
+    assert [arquivo["nome"] for arquivo in originais] == listagem
+    assert [arquivo["nome"] for arquivo in preservados] == [f"{nome}.pdf" for nome in listagem]
+
+
+def test_falha_em_um_arquivo_propaga_falha_na_pipeline(banco, sip, monkeypatch):
+    enviar = banco.estagio_enviar_preservado
+
+    def falhar_no_terceiro(arquivo):
+        if arquivo.nome == "doc3.txt":
+            raise banco.FalhaNaPipeline("Falha no upload do arquivo de preservação")
+        return enviar(arquivo)
+
+    monkeypatch.setattr(banco, "estagio_enviar_preservado", falhar_no_terceiro)
+
+    with pytest.raises(banco.FalhaNaPipeline, match="preservação"):
+        banco.processar_arquivos_do_sip("sip-falha", sip, "RA1")
@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+import pytest
+import requests
+
+import storage
+
+PARTE = 16 * 1024
+
+
+@pytest.fixture
+def em_partes(monkeypatch, tmp_path):
+    """Upload em partes a partir de 64 KiB, em partes de 16 KiB, com o estado em tmp_path."""
+    monkeypatch.setattr(storage, "UPLOAD_PARTES_LIMIAR_BYTES", 4 * PARTE)
+    monkeypatch.setattr(storage, "UPLOAD_PARTE_TAMANHO", PARTE)
+    monkeypatch.setattr(storage, "UPLOAD_PARTE_TENTATIVAS", 10)
+    monkeypatch.setattr(storage, "UPLOAD_ESTADO_DIR", str(tmp_path / "estado"))
+    monkeypatch.setattr(storage, "_partes_indisponivel", False)
+    return tmp_path
+
+
+def criar_arquivo(diretorio, nome, tamanho):
+    caminho = os.path.join(diretorio, nome)
+    with open(caminho, "wb") as f:
+        f.write(os.urandom(tamanho))
+    with open(caminho, "rb") as f:
+        return caminho, hashlib.sha256(f.read()).hexdigest()
+
+
+def contar_requisicoes(monkeypatch):
+    """Passa as requisições adiante, registrando (método, url) de cada uma."""
+    chamadas = []
+    original = storage.requisitar
+
+    def requisitar(metodo, url, **kwargs):
+        chamadas.append((metodo, url))
+        return original(metodo, url, **kwargs)
+
+    monkeypatch.setattr(storage, "requisitar", requisitar)
+    return chamadas
+
+
+def test_partes_recusadas_sao_repetidas(em_partes, iniciar_storage, monkeypatch, capsys):
+    monkeypatch.setattr(storage, "MINIO_SERVICE_API_URL", iniciar_storage(falha_partes=0.3))
+    caminho, checksum = criar_arquivo(em_partes, "planta.dwg", 20 * PARTE + 123)
+
+    resposta, checksums = storage.enviar_lote_para_storage_com_checksum([caminho], "originais", "RA1")
+
+    assert resposta == {"uploaded": ["planta.dwg"]}
+    assert checksums == [checksum]
+    assert "falhou (status 503)" in capsys.readouterr().out
+    assert os.listdir(storage.UPLOAD_ESTADO_DIR) == []
+
+
+def test_retomada_envia_so_as_partes_nao_confirmadas(em_partes, servicos, monkeypatch):
+    caminho, checksum = criar_arquivo(em_partes, "planta.dwg", 10 * PARTE + 1)
+    original = storage.requisitar
+    enviadas = []
+
+    def cair_depois_de_4_partes(metodo, url, **kwargs):
+        if metodo == "PUT":
+            if len(enviadas) >= 4:
+                raise requests.exceptions.ConnectionError("conexão perdida")
+            enviadas.append(url)
+        return original(metodo, url, **kwargs)
+
+    monkeypatch.setattr(storage, "UPLOAD_PARTES_PARALELAS", 1)
+    monkeypatch.setattr(storage, "requisitar", cair_depois_de_4_partes)
+    assert storage.enviar_em_partes_com_checksum(caminho, "originais", "RA1") == (None, None)
+    assert len(os.listdir(storage.UPLOAD_ESTADO_DIR)) == 1
+
+    monkeypatch.setattr(storage, "requisitar", original)
+    chamadas = contar_requisicoes(monkeypatch)
+    resposta, checksum_enviado = storage.enviar_em_partes_com_checksum(caminho, "originais", "RA1")
+
+    assert resposta == {"uploaded": ["planta.dwg"]}
+    assert checksum_enviado == checksum
+    partes = sorted(int(url.rsplit("/", 1)[1]) for metodo, url in chamadas if metodo == "PUT")
+    assert partes == list(range(5, 12))
+    assert not any(url.endswith("/storage/multipart") for _, url in chamadas)
+    assert os.listdir(storage.UPLOAD_ESTADO_DIR) == []
+
+
+def test_storage_sem_upload_em_partes_usa_o_envio_unico(em_partes, iniciar_storage, monkeypatch, capsys):
+    monkeypatch.setattr(storage, "MINIO_SERVICE_API_URL", iniciar_storage(multipart=False))
+    caminho, checksum = criar_arquivo(em_partes, "planta.dwg", 5 * PARTE)
+    chamadas = contar_requisicoes(monkeypatch)
+
+    resposta, checksums = storage.enviar_lote_para_storage_com_checksum([caminho], "originais", "RA1")
+
+    assert resposta == {"uploaded": ["planta.dwg"]}
+    assert checksums == [checksum]
+    assert storage._partes_indisponivel
+    assert "não oferece upload em partes" in capsys.readouterr().out
+    assert [url.rsplit("/", 1)[1] for _, url in chamadas] == ["multipart", "upload"]
+
+    # Os próximos arquivos grandes vão direto para /storage/upload.
+    chamadas.clear()
+    storage.enviar_lote_para_storage_com_checksum([caminho], "originais", "RA2")
+    assert [url.rsplit("/", 1)[1] for _, url in chamadas] == ["upload"]
+
+
+@pytest.mark.parametrize("tamanho", [0, 4 * PARTE - 1])
+def test_arquivos_abaixo_do_limiar_usam_o_envio_unico(em_partes, servicos, monkeypatch, tamanho):
+    caminho, checksum = criar_arquivo(em_partes, "pequeno.pdf", tamanho)
+    chamadas = contar_requisicoes(monkeypatch)
+
+    resposta, checksums = storage.enviar_lote_para_storage_com_checksum([caminho], "originais", "RA1")
+
+    assert resposta == {"uploaded": ["pequeno.pdf"]}
+    assert checksums == [checksum]
+    assert [url.rsplit("/", 1)[1] for _, url in chamadas] == ["upload"]
+
+
+def test_limiar_zero_desliga_o_upload_em_partes(em_partes, servicos, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_PARTES_LIMIAR_BYTES", 0)
+    caminho, checksum = criar_arquivo(em_partes, "planta.dwg", 10 * PARTE)
+    chamadas = contar_requisicoes(monkeypatch)
+
+    assert storage.enviar_lote_para_storage_com_checksum([caminho], "originais", "RA1")[1] == [checksum]
+    assert [url.rsplit("/", 1)[1] for _, url in chamadas] == ["upload"]
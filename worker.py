@@ -0,0 +1,135 @@
+"""Processo de ingestão, separado da API.
+
+    python -m worker
+
+Sobe WORKER_PROCESSOS processos (padrão: um por CPU), cada um com seu
+próprio consumidor Redis (o mesmo run_redis_consumer que rodava dentro da
+API), INGEST_WORKERS transferências em paralelo e seu pool de conversão.
+Assim o trabalho de CPU da ingestão (checksums, conversões, JSON) não
+disputa o GIL com as requisições da API, e cada processo usa um núcleo.
+
+O processo principal só supervisiona: reinicia um processo que morre e, no
+SIGTERM/SIGINT, repassa o SIGTERM aos filhos, que param de buscar mensagens
+e terminam as transferências em andamento (até INGEST_SHUTDOWN_TIMEOUT).
+
+Cada filho recebe uma faixa própria de portas do LibreOffice
+(CONVERSOR_PORTA_BASE + índice * CONVERSOR_INSTANCIAS) e, no modo stream,
+um nome de consumidor próprio. O schema não é tocado aqui: rode
+`python -m migracoes` antes. Com WORKER_METRICAS_PORTA, as métricas dos
+filhos (agregadas via PROMETHEUS_MULTIPROC_DIR) são servidas nessa porta.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import conversor
+import metricas
+
+WORKER_PROCESSOS = int(os.environ.get("WORKER_PROCESSOS", os.cpu_count() or 1))
+WORKER_METRICAS_PORTA = int(os.environ.get("WORKER_METRICAS_PORTA", 0))
+WORKER_REINICIO_ESPERA = 5
+INGEST_SHUTDOWN_TIMEOUT = int(os.environ.get("INGEST_SHUTDOWN_TIMEOUT", 60))
+
+
+def ambiente_do_processo(indice: int) -> dict:
+    """Variáveis que diferenciam o filho `indice`; aplicadas antes de importar main."""
+    ambiente = {"CONVERSOR_PORTA_BASE": str(conversor.CONVERSOR_PORTA_BASE + indice * conversor.CONVERSOR_INSTANCIAS)}
+    if os.environ.get("STREAM_CONSUMIDOR"):
+        ambiente["STREAM_CONSUMIDOR"] = f"{os.environ['STREAM_CONSUMIDOR']}-{indice}"
+    return ambiente
+
+
+def executar_processo(indice: int, ambiente: dict):
+    os.environ.update(ambiente)
+    # Ctrl+C chega a todo o grupo de processos; quem decide parar é o supervisor.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Um SIGTERM durante a importação de main (conexões, pools) só é lembrado.
+    parar_antes = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar_antes.set())
+    import main
+
+    signal.signal(signal.SIGTERM, lambda *_: main.parar_consumidor.set())
+    if parar_antes.is_set():
+        return
+    print(f"--- Worker {indice} (PID {os.getpid()}) iniciado ---")
+    try:
+        main.run_redis_consumer()
+    finally:
+        conversor.encerrar_pool()
+        print(f"--- Worker {indice} (PID {os.getpid()}) encerrado ---")
+
+
+class Supervisor:
+    def __init__(self, processos: int):
+        self.quantidade = processos
+        # spawn: cada filho importa main do zero (conexões, pools e STREAM_CONSUMIDOR próprios).
+        self.contexto = multiprocessing.get_context("spawn")
+        self.processos = {}
+        self.reiniciar_em = {}
+        self.parar = threading.Event()
+
+    def iniciar(self, indice: int):
+        processo = self.contexto.Process(
+            target=executar_processo, args=(indice, ambiente_do_processo(indice)), name=f"worker-{indice}",
+        )
+        processo.start()
+        self.processos[indice] = processo
+
+    def executar(self):
+        print(f"--- Iniciando {self.quantidade} processo(s) de ingestão ---")
+        for indice in range(self.quantidade):
+            self.iniciar(indice)
+
+        while not self.parar.wait(1):
+            agora = time.monotonic()
+            for indice, processo in self.processos.items():
+                if processo.is_alive():
+                    continue
+                if indice not in self.reiniciar_em:
+                    print(f"AVISO: Worker {indice} terminou com código {processo.exitcode}; reiniciando em {WORKER_REINICIO_ESPERA}s.")
+                    self.reiniciar_em[indice] = agora + WORKER_REINICIO_ESPERA
+                elif agora >= self.reiniciar_em[indice]:
+                    del self.reiniciar_em[indice]
+                    self.iniciar(indice)
+
+        self.encerrar()
+
+    def encerrar(self):
+        print("--- Encerrando os processos de ingestão... ---")
+        for processo in self.processos.values():
+            if processo.is_alive():
+                processo.terminate()
+        limite = time.monotonic() + INGEST_SHUTDOWN_TIMEOUT + 10
+        for indice, processo in self.processos.items():
+            processo.join(timeout=max(0, limite - time.monotonic()))
+            if processo.is_alive():
+                print(f"AVISO: Worker {indice} não terminou em {INGEST_SHUTDOWN_TIMEOUT}s; transferências em andamento serão interrompidas.")
+                processo.kill()
+                processo.join()
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processos", type=int, default=WORKER_PROCESSOS, help="processos de ingestão (padrão: WORKER_PROCESSOS)")
+    args = parser.parse_args(argv)
+
+    supervisor = Supervisor(args.processos)
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.parar.set())
+    signal.signal(signal.SIGINT, lambda *_: supervisor.parar.set())
+
+    if WORKER_METRICAS_PORTA:
+        if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            print("AVISO: WORKER_METRICAS_PORTA sem PROMETHEUS_MULTIPROC_DIR; as métricas dos processos de ingestão não serão vistas.")
+        from prometheus_client import start_http_server
+
+        start_http_server(WORKER_METRICAS_PORTA, registry=metricas.registro())
+        print(f"--- Métricas da ingestão em :{WORKER_METRICAS_PORTA}/metrics ---")
+
+    supervisor.executar()
+
+
+if __name__ == "__main__":
+    main_cli()